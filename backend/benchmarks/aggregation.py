@@ -0,0 +1,85 @@
+"""
+Shared single-pass aggregation vs the repeated pandas groupbys it replaced.
+
+Run from the backend directory:
+
+    python -m benchmarks.aggregation --rows 100000 1000000 --repeat 5
+
+The groupby side reproduces what analyze_data and generate_layout_recommendations computed
+separately (per order, per sub-category, per (Product ID, Product Name), per product and the
+aggregate state); the shared side is services.aggregation.aggregate_lines. Both run on the same
+cleaned frame and their totals are checked against each other.
+"""
+import argparse
+import time
+from typing import Callable, Dict
+
+import numpy as np
+
+from benchmarks.superstore import generate_superstore
+from services.aggregation import aggregate_lines
+from services.batch_ingest import NullDatabase
+from services.data_processor import DataProcessor
+
+
+def repeated_groupbys(df) -> Dict:
+    """The groupbys issued by one analyze_data + generate_layout_recommendations run before the shared stage."""
+    sum_mean = {'Sales': 'sum', 'Profit': 'sum', 'Quantity': 'sum', 'Discount': 'mean'}
+    return {
+        'orders': df.groupby('Order ID', observed=True)['Sales'].sum(),
+        'sub_categories': df.groupby('Sub-Category', observed=True).agg(sum_mean),
+        'top_products': df.groupby(['Product ID', 'Product Name'], observed=True).agg(sum_mean),
+        'state_sub_categories': df.groupby('Sub-Category', observed=True).agg(
+            Sales=('Sales', 'sum'), Profit=('Profit', 'sum'), Quantity=('Quantity', 'sum'),
+            discount_sum=('Discount', 'sum'), lines=('Discount', 'size')
+        ),
+        'state_products': df.groupby('Product ID', observed=True).agg(
+            product_name=('Product Name', 'first'), **{col: (col, how) for col, how in sum_mean.items()}
+        ),
+        'layout_products': df.groupby('Product ID', observed=True).agg(
+            {'Product Name': 'first', 'Sub-Category': 'first', **sum_mean}
+        )
+    }
+
+
+def best_of(func: Callable, df, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def check(df):
+    """Shared totals must match the groupby results (up to float summation order)."""
+    expected, shared = repeated_groupbys(df), aggregate_lines(df)
+    np.testing.assert_allclose(shared['orders']['Sales'], expected['orders'].to_numpy())
+    for col in ('Sales', 'Profit', 'Quantity', 'Discount'):
+        np.testing.assert_allclose(shared['sub_categories'][col], expected['sub_categories'][col].to_numpy())
+        np.testing.assert_allclose(shared['products'][col], expected['layout_products'][col].to_numpy())
+    assert (shared['products']['Product Name'].to_numpy() == expected['layout_products']['Product Name'].to_numpy()).all()
+    assert (shared['products'].index == expected['layout_products'].index).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the shared aggregation stage against repeated groupbys.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'groupbys':>10} {'shared':>10} {'speed-up':>9}")
+    for rows in args.rows:
+        raw = generate_superstore(rows, seed=args.seed)
+        # Clean through the processor so the frame has the production dtypes (categorical keys)
+        df = DataProcessor('benchmark.csv', NullDatabase(), cleaned=raw)._clean_frame(raw)
+        del raw
+        check(df)
+        groupby_s = best_of(repeated_groupbys, df, args.repeat)
+        shared_s = best_of(aggregate_lines, df, args.repeat)
+        print(f"{rows:>10,} {groupby_s:>9.3f}s {shared_s:>9.3f}s {groupby_s / shared_s:>8.1f}x", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Excel readers compared on a synthetic Superstore workbook.
+
+Run from the backend directory:
+
+    python -m benchmarks.excel --rows 20000 100000
+
+Each workbook's Postal Code column mixes number cells with zero-padded text cells ('02134'),
+as exports edited by hand do. The frames cleaned from the calamine and openpyxl readers must be
+identical, text cells included; the read + clean time and peak RSS of each reader are printed.
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.superstore import generate_superstore, write_superstore
+from services.batch_ingest import NullDatabase
+from services.data_processor import DataProcessor
+from services.profiler import PeakRss
+
+
+def mixed_workbook(path: str, rows: int, seed: int = 0):
+    """Write a workbook whose Postal Code column has number cells and leading-zero text cells."""
+    df = generate_superstore(rows, seed=seed)
+    postal_codes = df['Postal Code'].astype(object)
+    padded = df.index % 7 == 0
+    postal_codes[padded] = (postal_codes[padded] - 8000).map(lambda code: f"{code:05d}")
+    df['Postal Code'] = postal_codes
+    write_superstore(df, path)
+
+
+def read_and_clean(path: str, engine: str):
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        cleaned_df = DataProcessor(path, NullDatabase(), excel_engine=engine).clean_data()
+        seconds = time.perf_counter() - start
+    return cleaned_df, seconds, rss.peak
+
+
+def check(path: str):
+    """The calamine reader must clean to exactly what the openpyxl reader gives."""
+    calamine_df = read_and_clean(path, 'calamine')[0]
+    openpyxl_df = read_and_clean(path, 'openpyxl')[0]
+    pd.testing.assert_frame_equal(calamine_df, openpyxl_df)
+    assert calamine_df['Postal Code'].astype(str).str.startswith('0').any(), 'zero-padded codes were lost'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the calamine and openpyxl Excel readers.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[20000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join('benchmarks', 'data'))
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    print(f"{'rows':>10} {'engine':>9} {'seconds':>9} {'peak MB':>9}")
+    for rows in args.rows:
+        path = os.path.join(args.data_dir, f"superstore_mixed_{rows}_seed{args.seed}.xlsx")
+        if not os.path.exists(path):
+            mixed_workbook(path, rows, args.seed)
+        check(path)
+        for engine in ('openpyxl', 'calamine'):
+            _, seconds, peak = read_and_clean(path, engine)
+            print(f"{rows:>10,} {engine:>9} {seconds:>8.2f}s {peak / 2 ** 20:>9.1f}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Append-mode ingestion checked against a full replace of the same lines.
+
+Run from the backend directory against a scratch database (its tables are truncated):
+
+    python -m benchmarks.incremental --db-name retail_scratch --rows 100000 --split 0.6 --overlap 0.2
+
+A synthetic file is cut into a prefix and the rest, overlapping by --overlap of the lines so the append
+also has to skip lines that are already stored. Replacing with the prefix and appending the rest must give
+the same analysis and per-product totals as replacing with the whole file, and the products in the appended
+part must get the same layout priorities. Products the append does not touch keep the layout of the run that
+last saw them, and sections are not compared: append mode warm-starts the layout model instead of refitting it.
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+
+from benchmarks.superstore import generate_superstore, write_superstore
+from services.data_processor import DataProcessor
+from services.database import Database
+
+
+def load(path: str, db, incremental: bool, engine: str, model_path: str) -> Dict:
+    """Run the upload pipeline on one file and snapshot what readers see afterwards."""
+    processor = DataProcessor(path, db, incremental=incremental, model_path=model_path)
+    processor.save_cleaned_data()
+    results = processor.analyze_data(engine)
+    processor.generate_layout_recommendations()
+    return {
+        'analysis': {key: results[key] for key in ('metrics', 'sub_category_analysis', 'top_products')},
+        'products': db.fetch_product_totals(),
+        'priorities': {product_id: row['priority'] for product_id, row in db.fetch_store_layout().items()}
+    }
+
+
+def assert_close(expected, actual, path: str = ''):
+    """Compare nested results: same keys, numbers equal up to float summation order, anything else exactly."""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and expected.keys() == actual.keys(), f"{path}: keys differ"
+        for key in expected:
+            assert_close(expected[key], actual[key], f"{path}.{key}")
+    elif isinstance(expected, (int, float)) and not isinstance(expected, bool):
+        assert np.isclose(expected, actual, rtol=1e-9, atol=1e-6), f"{path}: {expected} != {actual}"
+    else:
+        assert expected == actual, f"{path}: {expected!r} != {actual!r}"
+
+
+def check(full: Dict, appended: Dict, touched):
+    """Replace-then-append must leave the same results as one replace of every line."""
+    assert_close(full['analysis'], appended['analysis'], 'analysis')
+    assert_close(full['products'], appended['products'], 'products')
+    assert appended['priorities'].keys() == full['priorities'].keys(), 'layout products differ'
+    differing = [
+        product_id for product_id in touched if full['priorities'][product_id] != appended['priorities'][product_id]
+    ]
+    assert not differing, f"layout priorities differ for {len(differing)} appended products"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check append-mode ingestion against a full replace.')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--split', type=float, default=0.6, help='Share of the lines in the replaced prefix')
+    parser.add_argument('--overlap', type=float, default=0.2, help='Share of the lines in both parts')
+    parser.add_argument('--engine', choices=DataProcessor.analytics_engines, default='pandas')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db-name', required=True, help='Scratch database; its tables are truncated')
+    parser.add_argument('--db-user', default=os.getenv('POSTGRES_USER', 'postgres'))
+    parser.add_argument('--db-password', default=os.getenv('POSTGRES_PASSWORD', 'postgres'))
+    parser.add_argument('--db-host', default=os.getenv('POSTGRES_HOST', 'localhost'))
+    parser.add_argument('--db-port', type=int, default=int(os.getenv('POSTGRES_PORT', 5000)))
+    args = parser.parse_args()
+
+    db = Database(
+        dbname=args.db_name, user=args.db_user, password=args.db_password, host=args.db_host, port=args.db_port
+    )
+
+    df = generate_superstore(args.rows, seed=args.seed)
+    prefix_end = round(args.rows * args.split)
+    rest_start = max(round(args.rows * (args.split - args.overlap)), 0)
+    with tempfile.TemporaryDirectory() as folder:
+        paths = {}
+        for name, part in (('full', df), ('prefix', df.iloc[:prefix_end]), ('rest', df.iloc[rest_start:])):
+            paths[name] = os.path.join(folder, f"{name}.csv")
+            write_superstore(part, paths[name])
+        model_path = os.path.join(folder, 'layout_model.joblib')
+
+        start = time.perf_counter()
+        full = load(paths['full'], db, False, args.engine, model_path)
+        print(f"replace {args.rows:,} lines: {time.perf_counter() - start:.2f}s")
+
+        load(paths['prefix'], db, False, args.engine, model_path)
+        start = time.perf_counter()
+        appended = load(paths['rest'], db, True, args.engine, model_path)
+        print(f"append {args.rows - rest_start:,} lines onto {prefix_end:,}: {time.perf_counter() - start:.2f}s")
+
+    check(full, appended, df['Product ID'].iloc[rest_start:].unique())
+    print(f"append matches replace: {len(full['products']):,} products, "
+          f"{len(full['analysis']['sub_category_analysis'])} sub-categories")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+End-to-end pipeline benchmark on synthetic Superstore files.
+
+Run from the backend directory:
+
+    python -m benchmarks.pipeline --rows 10000 100000 1000000 --formats csv xlsx --output report.json
+
+Each (rows, format) run happens in a fresh process, so peak RSS is per run. By default the DB stages
+use an in-memory stand-in; pass --db postgres with a scratch database to include them
+(replace-mode loads truncate its tables).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+from benchmarks.superstore import FORMATS, generate_superstore, write_superstore
+from services.batch_ingest import NullDatabase
+from services.profiler import PeakRss
+
+
+def time_stage(stages: Dict, name: str, func: Callable, *args, **kwargs):
+    """Run one stage and record its wall time and peak RSS."""
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        wall = time.perf_counter() - start
+    stages[name] = {'wall_s': round(wall, 4), 'peak_rss_mb': round(rss.peak / 2 ** 20, 1)}
+    print(f"  {name:<16} {wall:9.3f}s {rss.peak / 2 ** 20:9.1f} MB", flush=True)
+    return result
+
+
+def connect(options: Dict):
+    if options['db'] == 'none':
+        return NullDatabase()
+    from services.database import Database
+    return Database(
+        dbname=options['db_name'],
+        user=options['db_user'],
+        password=options['db_password'],
+        host=options['db_host'],
+        port=options['db_port']
+    )
+
+
+def run_pipeline(path: str, options: Dict) -> Dict:
+    """Run every pipeline stage on one file; executed in a child process."""
+    from services.data_processor import DataProcessor
+
+    db = connect(options)
+    stages = {}
+    processor = time_stage(
+        stages, 'read', DataProcessor, path, db, chunk_size=options['chunk_size'], report_memory=True
+    )
+    cleaned_df = time_stage(stages, 'clean', processor.clean_data)
+    time_stage(stages, 'db_load', processor.save_cleaned_data)
+    time_stage(stages, 'analyze', processor.analyze_data)
+    recommendations = time_stage(stages, 'cluster', processor.generate_layout_recommendations)
+    rules = time_stage(
+        stages, 'basket', processor.market_basket_analysis,
+        level=options['basket_level'], min_support=options['min_support']
+    )
+    if not isinstance(db, NullDatabase):
+        def fetch_analytics():
+            db.fetch_combined_store_data()
+            db.compute_analytics()
+            db.fetch_sales_series()
+        time_stage(stages, 'analytics_fetch', fetch_analytics)
+
+    memory = processor.memory_report
+    return {
+        'cleaned_rows': len(cleaned_df),
+        # Cleaned frame with text as Python objects vs categoricals and downcast integers
+        'frame_mb': {
+            'before': round(sum(memory['before'].values()) / 2 ** 20, 1),
+            'after': round(sum(memory['after'].values()) / 2 ** 20, 1)
+        } if memory else None,
+        'products': len(recommendations),
+        'rules': len(rules),
+        'stages': stages,
+        'total_s': round(sum(stage['wall_s'] for stage in stages.values()), 4),
+        # ru_maxrss survives exec on Linux, so it would include the parent's footprint
+        'peak_rss_mb': max(stage['peak_rss_mb'] for stage in stages.values())
+    }
+
+
+def ensure_file(data_dir: str, rows: int, file_format: str, options: Dict) -> str:
+    """Generate the input file once per shape; later runs reuse it."""
+    name = (f"superstore_{rows}_c{options['customers']}_p{options['products']}"
+            f"_s{options['sub_categories']}_seed{options['seed']}.{file_format}")
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Generating {path}", flush=True)
+        df = generate_superstore(
+            rows, options['customers'], options['products'], options['sub_categories'], seed=options['seed']
+        )
+        tmp_path = f"{path}.tmp.{file_format}"
+        write_superstore(df, tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the upload pipeline on synthetic Superstore files.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['csv'])
+    parser.add_argument('--customers', type=int, default=800)
+    parser.add_argument('--products', type=int, default=1800)
+    parser.add_argument('--sub-categories', type=int, default=17)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=0, help='CSV/TXT streaming chunk size (0 reads at once)')
+    parser.add_argument('--basket-level', choices=['product', 'sub_category'], default='sub_category')
+    parser.add_argument('--min-support', type=float, default=0.01)
+    parser.add_argument('--db', choices=['none', 'postgres'], default='none')
+    parser.add_argument('--db-name', help='Scratch database; required with --db postgres')
+    parser.add_argument('--db-user', default=os.getenv('POSTGRES_USER', 'postgres'))
+    parser.add_argument('--db-password', default=os.getenv('POSTGRES_PASSWORD', 'postgres'))
+    parser.add_argument('--db-host', default=os.getenv('POSTGRES_HOST', 'localhost'))
+    parser.add_argument('--db-port', type=int, default=int(os.getenv('POSTGRES_PORT', 5000)))
+    parser.add_argument('--data-dir', default=os.path.join('benchmarks', 'data'))
+    parser.add_argument('--output', default='benchmark_report.json')
+    args = parser.parse_args()
+    if args.db == 'postgres' and not args.db_name:
+        parser.error('--db postgres needs --db-name; the benchmark truncates the tables it loads')
+
+    options = vars(args)
+    options['chunk_size'] = args.chunk_size or None
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'options': {key: value for key, value in options.items() if key != 'db_password'},
+        'runs': []
+    }
+
+    # A fresh process per run keeps peak RSS and warm caches from leaking between sizes
+    context = multiprocessing.get_context('spawn')
+    for file_format in args.formats:
+        for rows in args.rows:
+            path = ensure_file(args.data_dir, rows, file_format, options)
+            print(f"{file_format} {rows} rows", flush=True)
+            with context.Pool(1) as pool:
+                result = pool.apply(run_pipeline, (path, options))
+            report['runs'].append({
+                'rows': rows,
+                'format': file_format,
+                'file_mb': round(os.path.getsize(path) / 2 ** 20, 2),
+                **result
+            })
+
+            # Rewrite after every run so a long benchmark leaves partial results behind
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Affinity shelf placement on synthetic Superstore baskets.
+
+Run from the backend directory:
+
+    python -m benchmarks.placement --rows 20000 100000 --capacity 0 70
+
+Each run places the catalogue with ShelfPlacement, then checks that the incrementally maintained
+gain matrix equals one recomputed from scratch and that no section holds more than its capacity.
+The append case lays out the first --split of the lines, then places the products of the remaining
+lines around the products the first layout carries over, as an appended upload does; the merged
+layout must stay within the capacity too. The placement time and the share of co-purchase affinity
+kept within sections are printed.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from benchmarks.superstore import generate_superstore
+from services.basket_analysis import pair_affinity
+from services.shelf_placement import ShelfPlacement, section_capacities
+
+N_SECTIONS = 30
+
+
+def check(placement: ShelfPlacement):
+    """The gain matrix left by place() must match a recomputation and every product must fit its section."""
+    sections = placement.sections
+    n_products, n_sections = len(sections), len(placement.capacities)
+    assert (sections >= 0).all() and (sections < n_sections).all(), 'a product was left unplaced'
+
+    load = np.bincount(sections, minlength=n_sections)
+    assert (load <= placement.capacities).all(), 'a section holds more products than its capacity'
+    assert (load == placement.load).all(), 'section loads drifted from the placement'
+
+    membership = csr_matrix((np.ones(n_products), (np.arange(n_products), sections)), shape=(n_products, n_sections))
+    expected = (placement.affinity @ membership).toarray()
+    np.testing.assert_allclose(placement.gain, expected, atol=1e-9)
+
+
+def place(df: pd.DataFrame, capacity: int, occupied=None):
+    """Place the products of df's lines, around products already occupying the sections."""
+    affinity, item_names = pair_affinity(df['Order ID'], df['Product ID'])
+    sales = df.groupby('Product ID')['Sales'].sum().reindex(item_names).to_numpy()
+    capacities = section_capacities(len(item_names), N_SECTIONS, capacity, occupied)
+    placement = ShelfPlacement(affinity, capacities)
+    start = time.perf_counter()
+    placement.place(sales)
+    return placement, pd.Index(item_names), time.perf_counter() - start
+
+
+def append_case(df: pd.DataFrame, capacity: int, split: float):
+    """Lay out a prefix, then the rest around the carried-over products; the merged layout must fit the capacity."""
+    cut = round(len(df) * split)
+    first, first_names, _ = place(df.iloc[:cut], capacity)
+    touched = pd.Index(df['Product ID'].iloc[cut:].unique())
+    carried = ~first_names.isin(touched)
+    occupied = np.bincount(first.sections[carried], minlength=N_SECTIONS)
+
+    placement, names, seconds = place(df.iloc[cut:], capacity, occupied)
+    check(placement)
+    merged_load = occupied + np.bincount(placement.sections, minlength=N_SECTIONS)
+    limit = capacity or -(-int(merged_load.sum()) // N_SECTIONS)
+    assert merged_load.max() <= limit, f"merged layout puts {merged_load.max()} products in a section of {limit}"
+    return placement, len(names) + int(carried.sum()), seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time affinity shelf placement and check its invariants.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[20000, 100000])
+    parser.add_argument('--capacity', type=int, nargs='+', default=[0],
+                        help='Products per section (0 splits the catalogue evenly)')
+    parser.add_argument('--split', type=float, default=0.6, help='Share of the lines laid out before the append')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'case':>7} {'products':>9} {'capacity':>9} {'seconds':>9} {'colocated':>10}")
+    for rows in args.rows:
+        df = generate_superstore(rows, seed=args.seed)
+        for capacity in args.capacity:
+            placement, names, seconds = place(df, capacity)
+            check(placement)
+            print(f"{rows:>10,} {'full':>7} {len(names):>9,} {capacity:>9} {seconds:>8.2f}s "
+                  f"{placement.colocated_share():>9.1%}", flush=True)
+
+            placement, n_products, seconds = append_case(df, capacity, args.split)
+            print(f"{rows:>10,} {'append':>7} {n_products:>9,} {capacity:>9} {seconds:>8.2f}s "
+                  f"{placement.colocated_share():>9.1%}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
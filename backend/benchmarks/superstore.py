@@ -0,0 +1,89 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+SEGMENTS = np.array(['Consumer', 'Corporate', 'Home Office'])
+REGIONS = np.array(['East', 'West', 'Central', 'South'])
+SHIP_MODES = np.array(['Standard Class', 'Second Class', 'First Class', 'Same Day'])
+CATEGORIES = np.array(['Furniture', 'Office Supplies', 'Technology'])
+FORMATS = ('csv', 'txt', 'xlsx')
+
+
+def generate_superstore(rows: int, customers: int = 800, products: int = 1800, sub_categories: int = 17,
+                        lines_per_order: float = 2.0, seed: int = 0) -> pd.DataFrame:
+    """
+    Build a Superstore-shaped frame with the columns DataProcessor expects.
+    Product popularity is Zipf-like so basket analysis finds frequent items, and
+    each order has one customer and one order date like the real export.
+    """
+    rng = np.random.default_rng(seed)
+    orders = max(1, int(rows / lines_per_order))
+
+    order_idx = np.sort(rng.integers(0, orders, rows))
+    customer = rng.integers(0, customers, orders)[order_idx]
+    weights = 1.0 / np.arange(1, products + 1) ** 0.9
+    product = rng.choice(products, rows, p=weights / weights.sum())
+    sub_category = product % sub_categories
+
+    order_date = pd.Timestamp('2014-01-01') + pd.to_timedelta(rng.integers(0, 4 * 365, orders)[order_idx], unit='D')
+    ship_date = order_date + pd.to_timedelta(rng.integers(0, 7, rows), unit='D')
+    quantity = rng.integers(1, 10, rows)
+    discount = rng.choice([0.0, 0.1, 0.2, 0.5], rows)
+    sales = np.round(rng.gamma(2.0, 60.0, rows) * quantity, 2)
+
+    return pd.DataFrame({
+        'Row ID': np.arange(1, rows + 1),
+        'Order ID': np.char.add('CA-', order_idx.astype(str)),
+        'Order Date': order_date.strftime('%Y-%m-%d'),
+        'Ship Date': ship_date.strftime('%Y-%m-%d'),
+        'Ship Mode': SHIP_MODES[rng.integers(0, len(SHIP_MODES), rows)],
+        'Customer ID': np.char.add('CU-', customer.astype(str)),
+        'Customer Name': np.char.add('Customer ', customer.astype(str)),
+        'Segment': SEGMENTS[customer % len(SEGMENTS)],
+        'Country/Region': 'United States',
+        'City': np.char.add('City ', (customer % 500).astype(str)),
+        'State/Province': np.char.add('State ', (customer % 49).astype(str)),
+        'Postal Code': 10000 + customer % 500,
+        'Region': REGIONS[customer % len(REGIONS)],
+        'Product ID': np.char.add('PR-', product.astype(str)),
+        'Category': CATEGORIES[sub_category % len(CATEGORIES)],
+        'Sub-Category': np.char.add('Sub-Category ', sub_category.astype(str)),
+        'Product Name': np.char.add('Product ', product.astype(str)),
+        'Sales': sales,
+        'Quantity': quantity,
+        'Discount': discount,
+        'Profit': np.round(sales * (0.25 - discount) + rng.normal(0, 5, rows), 2),
+    })
+
+
+def write_superstore(df: pd.DataFrame, path: str):
+    """Write the frame as CSV, tab-delimited TXT or XLSX depending on the extension."""
+    file_ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if file_ext == 'csv':
+        df.to_csv(path, index=False)
+    elif file_ext == 'txt':
+        df.to_csv(path, index=False, sep='\t')
+    elif file_ext == 'xlsx':
+        df.to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unsupported format: {file_ext}. Must be one of {', '.join(FORMATS)}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Superstore file.')
+    parser.add_argument('output', help='Output path; the extension selects csv, txt or xlsx')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--customers', type=int, default=800)
+    parser.add_argument('--products', type=int, default=1800)
+    parser.add_argument('--sub-categories', type=int, default=17)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = generate_superstore(args.rows, args.customers, args.products, args.sub_categories, seed=args.seed)
+    write_superstore(df, args.output)
+    print(f"Wrote {len(df)} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,9 +7,50 @@ class Config:
     UPLOAD_FOLDER = 'uploads'
     ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'csv', 'txt'}
 
+    # Cleaned frames are cached by content hash so re-uploads of the same file skip parsing
+    CLEANED_CACHE_FOLDER = os.getenv('CLEANED_CACHE_FOLDER', os.path.join(UPLOAD_FOLDER, 'cleaned'))
+    CLEANED_CACHE_ENTRIES = int(os.getenv('CLEANED_CACHE_ENTRIES', 8))
+
+    # CSV/TXT uploads are streamed in chunks of this many rows (0 disables streaming)
+    READ_CHUNK_SIZE = int(os.getenv('READ_CHUNK_SIZE', 100000))
+
+    # Excel uploads: reader ('auto' uses calamine when installed, else openpyxl/xlrd) and the sheet
+    # to read, by name or zero-based index
+    EXCEL_ENGINE = os.getenv('EXCEL_ENGINE', 'auto')
+    EXCEL_SHEET = os.getenv('EXCEL_SHEET', '0')
+    EXCEL_SHEET = int(EXCEL_SHEET) if EXCEL_SHEET.isdigit() else EXCEL_SHEET
+
+    # Default ingestion mode: 'replace' wipes previous uploads, 'append' merges into them
+    INGEST_MODE = os.getenv('INGEST_MODE', 'replace')
+
+    # Layout clustering: cluster count, sections given to each cluster (clusters * sections
+    # must fit the 30 store sections) and the persisted scaler/model that 'append' uploads warm-start from
+    LAYOUT_CLUSTERS = int(os.getenv('LAYOUT_CLUSTERS', 4))
+    LAYOUT_SECTIONS_PER_CLUSTER = int(os.getenv('LAYOUT_SECTIONS_PER_CLUSTER', 4))
+    LAYOUT_MODEL_PATH = os.getenv('LAYOUT_MODEL_PATH', os.path.join('models', 'layout_model.joblib'))
+
+    # Layout strategy: 'cluster' (KMeans sections) or 'affinity' (co-purchased products share a section),
+    # and the products per section for either strategy (0 splits the catalogue evenly over the 30 sections)
+    LAYOUT_STRATEGY = os.getenv('LAYOUT_STRATEGY', 'cluster')
+    LAYOUT_SECTION_CAPACITY = int(os.getenv('LAYOUT_SECTION_CAPACITY', 0))
+
+    # Analytics engine used after ingestion: 'pandas' (uploaded frame) or 'sql' (stored history)
+    ANALYTICS_ENGINE = os.getenv('ANALYTICS_ENGINE', 'pandas')
+
+    # API responses at least this large are gzip/brotli compressed when the client accepts it (0 disables)
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+
+    # Background processing of uploads
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 1))
+    # Finished job records (and their results) are kept this many seconds, at most JOB_MAX_FINISHED of them
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', 3600))
+    JOB_MAX_FINISHED = int(os.getenv('JOB_MAX_FINISHED', 100))
+
     # Database configuration
     DB_NAME = os.getenv('POSTGRES_DB', 'retail')
     DB_USER = os.getenv('POSTGRES_USER', 'postgres')
     DB_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'postgres')
     DB_HOST = os.getenv('POSTGRES_HOST', 'localhost')
     DB_PORT = int(os.getenv('POSTGRES_PORT', 5000))
+    DB_POOL_MIN = int(os.getenv('POSTGRES_POOL_MIN', 1))
+    DB_POOL_MAX = int(os.getenv('POSTGRES_POOL_MAX', 10))
@@ -1,41 +1,115 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import os
+import uuid
+from datetime import date
+from typing import Union
 from config import Config
+from services.basket_analysis import basket_rules
 from services.data_processor import DataProcessor
 from services.database import Database
+from services.encoding import compress_response, encode, negotiate
+from services.frame_cache import FrameCache
+from services.job_queue import JobQueue
+from services.profiler import StageProfiler, metrics_registry
+from services.response_cache import ResponseCache
 
 api = Blueprint('api', __name__)
 
-# Initialize Database
+# Initialize Database; operations check out pooled connections, so the instance is shared across threads
 try:
     db = Database(
         dbname="retail",
         user="postgres",
         password="postgres",
         host="localhost",
-        port=5000
+        port=5000,
+        minconn=Config.DB_POOL_MIN,
+        maxconn=Config.DB_POOL_MAX
     )
 except Exception as e:
     db = None
     print(f"Failed to connect to the database: {e}")
 
+# Uploads are processed in the background; clients poll /api/jobs/<id>
+job_queue = JobQueue(
+    max_workers=Config.JOB_WORKERS,
+    result_ttl=Config.JOB_RESULT_TTL,
+    max_finished=Config.JOB_MAX_FINISHED
+)
+
+# Cleaned frames of earlier uploads, reused when the same file is uploaded again
+cleaned_cache = FrameCache(Config.CLEANED_CACHE_FOLDER, max_entries=Config.CLEANED_CACHE_ENTRIES)
+
+# Serialized analytics payloads, reused until new results or layouts are stored
+response_cache = ResponseCache()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+
+def encoded(payload, status: int = 200):
+    """Response serialized as JSON or msgpack, whichever the Accept header prefers."""
+    mimetype = negotiate(request.accept_mimetypes)
+    response = current_app.response_class(encode(payload, mimetype), status=status, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+
+@api.after_request
+def compress(response):
+    if Config.COMPRESSION_MIN_BYTES <= 0:
+        return response
+    return compress_response(response, request.accept_encodings, Config.COMPRESSION_MIN_BYTES)
+
+@api.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok', 'database': db is not None})
+
+
 @api.route('/analytics', methods=['GET'])
 def get_analytics():
     try:
         if not db:
             return jsonify({'error': 'Database connection is not initialized'}), 500
 
-        store_data = db.fetch_combined_store_data()
+        if any(param in request.args for param in ('from', 'to', 'granularity')):
+            return get_sales_series()
 
-        return jsonify({
-            'data': store_data['layout'],
-            'analytics': store_data['analytics'],
-            'loading': False
-        })
+        # 'stored' serves the results saved by the last upload, 'sql' recomputes them over all stored lines
+        engine = request.args.get('engine', 'stored')
+        if engine not in ('stored', 'sql'):
+            return jsonify({'error': 'Invalid engine. Supported engines: stored, sql', 'loading': False}), 400
+
+        # The full layout is only included on request; the dashboard pages it through /api/layout
+        include_layout = request.args.get('include') == 'layout'
+
+        mimetype = negotiate(request.accept_mimetypes)
+        version = db.fetch_data_version()
+        cache_name = f"analytics_{engine}{'_layout' if include_layout else ''}_{mimetype}"
+        cached = response_cache.get(cache_name, version)
+        if cached is None:
+            if include_layout:
+                store_data = db.fetch_combined_store_data()
+                layout, analytics = store_data['layout'], store_data['analytics']
+            else:
+                layout, analytics = None, None
+            if engine == 'sql':
+                analytics = db.compute_analytics()
+            elif analytics is None:
+                analytics = db.fetch_analysis_results()
+            payload = {'analytics': analytics, 'loading': False}
+            if include_layout:
+                payload['data'] = layout
+            cached = response_cache.set(cache_name, version, encode(payload, mimetype))
+
+        body, etag = cached
+        response = current_app.response_class(body, mimetype=mimetype)
+        response.vary.add('Accept')
+        response.set_etag(etag)
+        # Let browsers keep the payload but revalidate it with If-None-Match on every request
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({
             'error': str(e),
@@ -43,6 +117,203 @@ def get_analytics():
         }), 500
 
 
+def get_sales_series():
+    """Time-bucketed sales for /api/analytics?from=&to=&granularity= (ISO dates, inclusive)."""
+    try:
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else None
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date. Use YYYY-MM-DD for from and to', 'loading': False}), 400
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in Database.series_granularities:
+        return jsonify({
+            'error': f"Invalid granularity. Supported granularities: {', '.join(Database.series_granularities)}",
+            'loading': False
+        }), 400
+
+    response = jsonify({
+        'from': start.isoformat() if start else None,
+        'to': end.isoformat() if end else None,
+        'granularity': granularity,
+        'series': db.fetch_sales_series(start, end, granularity),
+        'loading': False
+    })
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@api.route('/layout', methods=['GET'])
+def get_layout():
+    """One page of layout recommendations, filtered by section, priority and sub-category."""
+    try:
+        if not db:
+            return jsonify({'error': 'Database connection is not initialized'}), 500
+
+        # type=int would silently turn ?section=abc into "no filter", so parse explicitly
+        section = request.args.get('section')
+        limit = request.args.get('limit', '100')
+        try:
+            section = int(section) if section is not None else None
+            limit = int(limit)
+        except ValueError:
+            return jsonify({'error': 'section and limit must be integers'}), 400
+        priority = request.args.get('priority')
+        sub_category = request.args.get('sub_category')
+        if priority is not None and priority not in ('high', 'medium', 'low'):
+            return jsonify({'error': 'Invalid priority. Supported priorities: high, medium, low'}), 400
+        if not 1 <= limit <= 1000:
+            return jsonify({'error': 'limit must be between 1 and 1000'}), 400
+
+        # The cursor is '<section>:<product_id>' of the last row of the previous page
+        after = request.args.get('after')
+        if after is not None:
+            after_section, _, after_product = after.partition(':')
+            if not after_section.lstrip('-').isdigit() or not after_product:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            after = (int(after_section), after_product)
+
+        page = db.fetch_layout_page(section, priority, sub_category, after, limit)
+        next_cursor = f"{page['next'][0]}:{page['next'][1]}" if page['next'] else None
+        response = jsonify({
+            'items': page['items'],
+            'next_cursor': next_cursor,
+            'limit': limit
+        })
+        response.add_etag()
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/layout/summary', methods=['GET'])
+def get_layout_summary():
+    """Per-section product counts for the store map."""
+    try:
+        if not db:
+            return jsonify({'error': 'Database connection is not initialized'}), 500
+
+        version = db.fetch_data_version()
+        cached = response_cache.get('layout_summary', version)
+        if cached is None:
+            body = jsonify({'sections': db.fetch_layout_summary()}).get_data()
+            cached = response_cache.set('layout_summary', version, body)
+
+        body, etag = cached
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api.route('/basket-analysis', methods=['GET'])
+def get_basket_analysis():
+    try:
+        if not db:
+            return jsonify({'error': 'Database connection is not initialized'}), 500
+
+        level = request.args.get('level', 'product')
+        min_support = request.args.get('min_support', 0.01, type=float)
+        min_lift = request.args.get('min_lift', 1.0, type=float)
+        max_len = request.args.get('max_len', None, type=int)
+        if not 0 < min_support <= 1:
+            return jsonify({'error': 'min_support must be in (0, 1]'}), 400
+
+        order_items = db.fetch_order_items(level)
+        rules = basket_rules(
+            order_items['order_id'],
+            order_items['item'],
+            min_support=min_support,
+            max_len=max_len,
+            min_lift=min_lift
+        )
+
+        return jsonify({
+            'level': level,
+            'min_support': min_support,
+            'max_len': max_len,
+            'rules': rules
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def run_processing_pipeline(filepath: str, filename: str, incremental: bool = False, engine: str = 'pandas',
+                            layout: str = 'cluster', sheet: Union[int, str] = Config.EXCEL_SHEET):
+    """Read, clean, store and analyze an uploaded file. Runs on a job worker."""
+    try:
+        # Each stage's duration, rows, peak RSS and DB round-trips are stored per upload in pipeline_stages
+        with StageProfiler(db, filename) as profiler:
+            # Replace mode clears the previous upload inside save_cleaned_data
+            with profiler.stage('read') as record:
+                processor = DataProcessor(
+                    filepath, db,
+                    chunk_size=Config.READ_CHUNK_SIZE or None,
+                    incremental=incremental,
+                    n_clusters=Config.LAYOUT_CLUSTERS,
+                    sections_per_cluster=Config.LAYOUT_SECTIONS_PER_CLUSTER,
+                    model_path=Config.LAYOUT_MODEL_PATH,
+                    cache=cleaned_cache if Config.CLEANED_CACHE_ENTRIES > 0 else None,
+                    excel_engine=Config.EXCEL_ENGINE,
+                    sheet=sheet
+                )
+                if processor.df is not None:
+                    record['rows_out'] = len(processor.df)
+
+            # Streaming uploads are cleaned chunk by chunk inside the load stage, which keeps the cleaned
+            # frame for analysis and layout
+            if not processor.streaming:
+                with profiler.stage('clean', rows_in=record['rows_out']) as record:
+                    record['rows_out'] = len(processor.clean_data())
+
+            with profiler.stage('load', rows_in=record['rows_out']) as record:
+                processor.save_cleaned_data()
+                record['rows_out'] = len(processor.clean_data())
+
+            # Analyze data and generate layout recommendations
+            with profiler.stage('analyze'):
+                analysis_results = processor.analyze_data(engine)
+            with profiler.stage('layout') as record:
+                # Stores the recommendations; analyze_data already stored the analysis results
+                layout_recommendations = processor.generate_layout_recommendations(
+                    layout, Config.LAYOUT_SECTION_CAPACITY
+                )
+                record['rows_out'] = len(layout_recommendations)
+
+        response_cache.invalidate()
+
+        # Update the history status to Completed
+        db.update_file_status(filename, status='Completed')
+
+        # A summary only; the full layout is paged from /api/layout
+        return {
+            'message': 'Data processed successfully',
+            'metrics': analysis_results.get('metrics', {}),
+            'products': len(layout_recommendations),
+            'sections': len({recommendation['section'] for recommendation in layout_recommendations.values()}),
+            'colocated_share': processor.colocated_share,
+            'links': {
+                'analytics': '/api/analytics',
+                'layout': '/api/layout',
+                'layout_summary': '/api/layout/summary'
+            }
+        }
+
+    except Exception as e:
+        # Update the history status to Failed
+        db.update_file_status(filename, status='Failed', error_message=str(e))
+        print(f"Error processing file: {e}")
+        raise
+
+    finally:
+        os.remove(filepath)
+
+
 @api.route('/process-data', methods=['POST'])
 def process_data():
     try:
@@ -59,10 +330,27 @@ def process_data():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type. Supported formats: XLSX, XLS, CSV, TXT'}), 400
 
-        db.create_tables()
-        db.clear_previous_data()
+        # 'append' merges the upload into the stored history, 'replace' starts over
+        mode = request.form.get('mode', request.args.get('mode', Config.INGEST_MODE))
+        if mode not in ('replace', 'append'):
+            return jsonify({'error': 'Invalid mode. Supported modes: replace, append'}), 400
+
+        engine = request.form.get('engine', request.args.get('engine', Config.ANALYTICS_ENGINE))
+        if engine not in DataProcessor.analytics_engines:
+            return jsonify({'error': 'Invalid engine. Supported engines: pandas, sql'}), 400
+
+        layout = request.form.get('layout', request.args.get('layout', Config.LAYOUT_STRATEGY))
+        if layout not in DataProcessor.layout_strategies:
+            return jsonify({'error': 'Invalid layout. Supported layouts: cluster, affinity'}), 400
+
+        # Workbook sheet by name or zero-based index; ignored for CSV/TXT
+        sheet = request.form.get('sheet', request.args.get('sheet', Config.EXCEL_SHEET))
+        if isinstance(sheet, str) and sheet.isdigit():
+            sheet = int(sheet)
 
-        filename = secure_filename(file.filename)
+        # Prefix the job id so concurrent uploads never share a file or history row
+        job_id = uuid.uuid4().hex
+        filename = f"{job_id}_{secure_filename(file.filename)}"
         filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
         file.save(filepath)
@@ -70,58 +358,43 @@ def process_data():
         # Log the upload in the history table
         db.add_file_history(filename)
 
-        processor = DataProcessor(filepath, db)
-
-        try:
-            db.create_tables()
-            db.clear_previous_data()
-
-            processor.save_cleaned_data()
-
-            # Extract data for customers, products, and sales
-            customers_data = processor.get_customers_data()
-            products_data = processor.get_products_data()
-            sales_data = processor.get_sales_data()
-
-            # # Save customers data
-            # for customer in customers_data:
-            #     db.add_customer(customer)
-            #
-            # # Save products data
-            # for product in products_data:
-            #     db.add_product(product)
-            #
-            # # Save sales data
-            # for sale in sales_data:
-            #     db.add_sale(sale)
+        job_queue.submit(
+            run_processing_pipeline, filepath, filename, mode == 'append', engine, layout, sheet,
+            job_id=job_id, filename=filename, mode=mode, engine=engine, layout=layout
+        )
 
+        return encoded({
+            'message': 'File queued for processing',
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f"/api/jobs/{job_id}"
+        }, status=202)
 
-            # Analyze data and generate layout recommendations
-            analysis_results = processor.analyze_data()
-            layout_recommendations = processor.generate_layout_recommendations()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-            # Save analysis results and layout recommendations
-            db.store_analysis_results(analysis_results)
-            db.store_layout_recommendations(layout_recommendations)
 
-            # Update the history status to Completed
-            db.update_file_status(filename, status='Completed')
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage totals since startup and the job queue state, in the Prometheus text format."""
+    gauges = {'jobs': {'label': 'status', 'values': job_queue.status_counts()}}
+    return current_app.response_class(metrics_registry.render(gauges), mimetype='text/plain; version=0.0.4')
 
-            return jsonify({
-                'message': 'Data processed successfully',
-                'category_analysis': analysis_results,
-                'layout_recommendations': layout_recommendations
-            })
 
-        except Exception as e:
-            # Update the history status to Failed
-            db.update_file_status(filename, status='Failed', error_message=str(e))
-            print(f"Error processing file: {e}")
-            return jsonify({'error': str(e)}), 500
+@api.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    try:
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
 
-        finally:
-            os.remove(filepath)
+        # Stage progress comes from the statuses DataProcessor writes to file_history
+        file_status = db.fetch_file_status(job['filename']) if db else {}
+        job['stage'] = file_status.get('status')
+        if file_status.get('error_message'):
+            job['error'] = job['error'] or file_status['error_message']
+        job['stages'] = db.fetch_stage_metrics(job['filename']) if db else []
 
+        return encoded(job)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
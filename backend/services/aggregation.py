@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+
+def factorize_keys(keys: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """
+    Integer codes and labels for a key column, in the order groupby(sort=True) gives its groups.
+    Categorical keys reuse their codes; categories without lines are kept and dropped by the caller.
+    """
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        return keys.cat.codes.to_numpy(dtype=np.int64), keys.cat.categories
+    codes, labels = pd.factorize(keys, sort=True)
+    return codes.astype(np.int64), pd.Index(labels)
+
+
+def group_sums(codes: np.ndarray, n_groups: int, values: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Per-group sums of each value column plus the group's line count, one bincount per column."""
+    sums = {name: np.bincount(codes, weights=column, minlength=n_groups) for name, column in values.items()}
+    sums['lines'] = np.bincount(codes, minlength=n_groups)
+    return sums
+
+
+def aggregate_lines(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Per-order, per-sub-category and per-product totals of cleaned sales lines in a single pass over
+    the value columns. Every frame is ordered by its key and holds Sales/Profit/Quantity sums, the
+    Discount sum and mean and the line count; products also carry their first name and sub-category.
+    """
+    values = {
+        'Sales': df['Sales'].to_numpy(dtype=np.float64),
+        'Profit': df['Profit'].to_numpy(dtype=np.float64),
+        'Quantity': df['Quantity'].to_numpy(dtype=np.float64),
+        'discount_sum': df['Discount'].to_numpy(dtype=np.float64)
+    }
+
+    aggregates = {}
+    for name, key, columns in (
+        ('orders', 'Order ID', ['Sales']),
+        ('sub_categories', 'Sub-Category', ['Sales', 'Profit', 'Quantity', 'discount_sum']),
+        ('products', 'Product ID', ['Sales', 'Profit', 'Quantity', 'discount_sum'])
+    ):
+        codes, labels = factorize_keys(df[key])
+        sums = group_sums(codes, len(labels), {column: values[column] for column in columns})
+        frame = pd.DataFrame(sums, index=pd.Index(labels, name=key))
+        if 'Quantity' in frame:
+            frame['Quantity'] = frame['Quantity'].round().astype(np.int64)
+            frame['Discount'] = frame['discount_sum'] / frame['lines']
+
+        observed = frame['lines'].to_numpy() > 0
+        if name == 'products':
+            # Name and sub-category of each product's first line, like groupby().first()
+            # A hash-based duplicate scan finds first lines without sorting the codes
+            first_line = np.flatnonzero(~pd.Series(codes).duplicated().to_numpy())
+            present = codes[first_line]
+            for column in ('Product Name', 'Sub-Category'):
+                first = np.empty(len(labels), dtype=object)
+                first[present] = df[column].iloc[first_line].to_numpy(dtype=object)
+                frame[column] = first
+        aggregates[name] = frame[observed]
+    return aggregates
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from mlxtend.frequent_patterns import fpgrowth, association_rules
+from typing import Dict, List, Optional
+
+
+def build_basket_matrix(order_ids: pd.Series, items: pd.Series, min_support: float = 0.0):
+    """
+    Build a sparse order x item incidence matrix.
+    Items whose order support is below min_support cannot appear in a frequent itemset,
+    so they are dropped before the matrix is built. Returns (matrix, item_names).
+    """
+    order_codes, order_index = pd.factorize(order_ids)
+    item_codes, item_names = pd.factorize(items)
+    n_orders, n_items = len(order_index), len(item_names)
+
+    # One entry per distinct (order, item) pair
+    pairs = np.unique(order_codes.astype(np.int64) * n_items + item_codes)
+    rows, cols = pairs // n_items, pairs % n_items
+
+    item_support = np.bincount(cols, minlength=n_items) / max(n_orders, 1)
+    keep = item_support >= min_support
+    remap = np.cumsum(keep) - 1
+    mask = keep[cols]
+
+    matrix = csr_matrix(
+        (np.ones(mask.sum(), dtype=bool), (rows[mask], remap[cols[mask]])),
+        shape=(n_orders, int(keep.sum()))
+    )
+    return matrix, list(item_names[keep])
+
+
+def basket_rules(order_ids: pd.Series, items: pd.Series, min_support: float = 0.01,
+                 max_len: Optional[int] = None, min_lift: float = 1.0) -> List[Dict]:
+    """Mine association rules with FP-Growth over a sparse basket matrix."""
+    matrix, item_names = build_basket_matrix(order_ids, items, min_support)
+    if matrix.shape[1] == 0:
+        return []
+
+    # Orders without any frequent item never reach the FP-tree; mine the rest and rescale supports
+    n_orders = matrix.shape[0]
+    matrix = matrix[matrix.getnnz(axis=1) > 0]
+    if matrix.shape[0] == 0:
+        return []
+    scale = matrix.shape[0] / n_orders
+
+    basket = pd.DataFrame.sparse.from_spmatrix(matrix, columns=item_names)
+    frequent_itemsets = fpgrowth(basket, min_support=min_support / scale, use_colnames=True, max_len=max_len)
+    if frequent_itemsets.empty:
+        return []
+    frequent_itemsets['support'] *= scale
+
+    rules = association_rules(frequent_itemsets, metric="lift", min_threshold=min_lift)
+
+    return [{
+        'antecedents': list(antecedents),
+        'consequents': list(consequents),
+        'support': support,
+        'confidence': confidence,
+        'lift': lift
+    } for antecedents, consequents, support, confidence, lift in zip(
+        rules['antecedents'].tolist(),
+        rules['consequents'].tolist(),
+        rules['support'].astype(float).tolist(),
+        rules['confidence'].astype(float).tolist(),
+        rules['lift'].astype(float).tolist()
+    )]
+
+
+def pair_affinity(order_ids: pd.Series, items: pd.Series, min_lift: float = 1.0, min_orders: int = 2):
+    """
+    Symmetric item x item matrix of co-purchase support for pairs bought together in at least
+    min_orders orders with a lift above min_lift. Returns (matrix, item_names).
+    """
+    matrix, item_names = build_basket_matrix(order_ids, items)
+    n_orders = max(matrix.shape[0], 1)
+    incidence = matrix.astype(np.float32)
+
+    co_orders = (incidence.T @ incidence).tocoo()
+    item_orders = np.asarray(incidence.sum(axis=0)).ravel()
+    rows, cols, counts = co_orders.row, co_orders.col, co_orders.data
+    lift = counts * n_orders / (item_orders[rows] * item_orders[cols])
+    keep = (rows != cols) & (counts >= min_orders) & (lift > min_lift)
+
+    affinity = csr_matrix(
+        (counts[keep] / n_orders, (rows[keep], cols[keep])),
+        shape=(len(item_names), len(item_names))
+    )
+    return affinity, item_names
@@ -0,0 +1,225 @@
+"""
+Batch ingestion of several uploads, e.g. one export per store.
+
+Run from the backend directory:
+
+    python -m services.batch_ingest 'exports/*.csv' exports/east.xlsx --mode replace --workers 4
+
+Files are read and cleaned in a process pool, merged with duplicate (Order ID, Row ID) lines dropped
+(the first file in name order wins), and bulk-loaded in one pass.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config import Config
+from services.data_processor import DataProcessor
+from services.frame_cache import FrameCache
+from services.profiler import StageProfiler
+
+
+class NullDatabase:
+    """Database stand-in that accepts every call and stores nothing, for processing outside the pipeline."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    """Resolve directories and glob patterns to the supported files they contain, sorted and without repeats."""
+    paths = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*')
+        matches = glob.glob(pattern) or ([pattern] if os.path.isfile(pattern) else [])
+        paths.extend(
+            path for path in matches
+            if os.path.isfile(path) and path.rsplit('.', 1)[-1].lower() in Config.ALLOWED_EXTENSIONS
+        )
+    return sorted(set(paths), key=lambda path: (os.path.basename(path), path))
+
+
+def clean_file(path: str, chunk_size: Optional[int], cache_folder: Optional[str], cache_entries: int) -> Dict:
+    """Read and clean one file; runs in a worker process."""
+    start = time.perf_counter()
+    cache = FrameCache(cache_folder, max_entries=cache_entries) if cache_folder else None
+    processor = DataProcessor(path, NullDatabase(), chunk_size=chunk_size, cache=cache,
+                              excel_engine=Config.EXCEL_ENGINE, sheet=Config.EXCEL_SHEET)
+    cleaned_df = processor.clean_data()
+    return {
+        'path': path,
+        'frame': cleaned_df,
+        'cache_hit': processor.cache_hit,
+        'seconds': time.perf_counter() - start
+    }
+
+
+def merge_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate cleaned frames in order and keep the first line for each (Order ID, Row ID), the line key of
+    the sales tables. Per-store exports all number their rows from 1, so Row ID alone is not unique.
+    """
+    categorical_columns = frames[0].select_dtypes('category').columns
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.drop_duplicates(subset=['Order ID', 'Row ID'], keep='first')
+    # Categories differ between files, so concat falls back to object columns
+    for col in categorical_columns:
+        merged[col] = merged[col].astype('category')
+    return merged
+
+
+def ingest_batch(paths: List[str], db, batch_name: str, workers: Optional[int] = None, incremental: bool = False,
+                 engine: str = 'pandas', layout: str = 'cluster', cache: Optional[FrameCache] = None) -> Dict:
+    """
+    Clean the files in parallel, merge them and load, analyze and lay out the result once.
+    Each file gets its own file_history row; the merged load is recorded under batch_name.
+    """
+    start = time.perf_counter()
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    for path in paths:
+        db.add_file_history(os.path.basename(path))
+
+    results = {}
+    failed = {}
+    chunk_size = Config.READ_CHUNK_SIZE or None
+    cache_folder = cache.folder if cache else None
+    cache_entries = cache.max_entries if cache else 0
+    # Spawned workers do not inherit the parent's pooled database connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(clean_file, path, chunk_size, cache_folder, cache_entries): path
+            for path in paths
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            name = os.path.basename(path)
+            try:
+                result = future.result()
+            except Exception as e:
+                failed[path] = str(e)
+                db.update_file_status(name, 'Cleaning_Failed', str(e))
+                print(f"[{done}/{len(paths)}] {name}: failed: {e}", flush=True)
+                continue
+            results[path] = result
+            db.update_file_status(name, 'Cleaning_Success')
+            print(f"[{done}/{len(paths)}] {name}: {len(result['frame']):,} rows in {result['seconds']:.2f}s"
+                  f"{' (cached)' if result['cache_hit'] else ''}", flush=True)
+    clean_seconds = time.perf_counter() - start
+
+    if not results:
+        raise ValueError('No file in the batch could be cleaned')
+
+    frames = [results[path]['frame'] for path in paths if path in results]
+    cleaned_rows = sum(len(frame) for frame in frames)
+    merged = merge_frames(frames)
+    del frames, results
+    print(f"Merged {cleaned_rows:,} rows into {len(merged):,} "
+          f"({cleaned_rows - len(merged):,} duplicate lines dropped)", flush=True)
+
+    load_start = time.perf_counter()
+    with StageProfiler(db, batch_name) as profiler:
+        processor = DataProcessor(
+            batch_name, db,
+            incremental=incremental,
+            n_clusters=Config.LAYOUT_CLUSTERS,
+            sections_per_cluster=Config.LAYOUT_SECTIONS_PER_CLUSTER,
+            model_path=Config.LAYOUT_MODEL_PATH,
+            cleaned=merged
+        )
+        with profiler.stage('load', rows_in=len(merged)):
+            processor.save_cleaned_data()
+        with profiler.stage('analyze'):
+            processor.analyze_data(engine)
+        with profiler.stage('layout') as record:
+            recommendations = processor.generate_layout_recommendations(layout, Config.LAYOUT_SECTION_CAPACITY)
+            record['rows_out'] = len(recommendations)
+    load_seconds = time.perf_counter() - load_start
+    db.update_file_status(batch_name, 'Completed')
+
+    for path in paths:
+        if path not in failed:
+            db.update_file_status(os.path.basename(path), 'Completed')
+
+    total_seconds = time.perf_counter() - start
+    return {
+        'files': len(paths) - len(failed),
+        'failed': failed,
+        'cleaned_rows': cleaned_rows,
+        'loaded_rows': len(merged),
+        'duplicates': cleaned_rows - len(merged),
+        'input_mb': total_bytes / 2 ** 20,
+        'clean_seconds': clean_seconds,
+        'load_seconds': load_seconds,
+        'total_seconds': total_seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clean several uploads in parallel and load them in one pass.')
+    parser.add_argument('inputs', nargs='+', help='Files, directories or glob patterns')
+    parser.add_argument('--mode', choices=['replace', 'append'], default=Config.INGEST_MODE)
+    parser.add_argument('--engine', choices=DataProcessor.analytics_engines, default=Config.ANALYTICS_ENGINE)
+    parser.add_argument('--layout', choices=DataProcessor.layout_strategies, default=Config.LAYOUT_STRATEGY)
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not reuse or store cleaned frames')
+    args = parser.parse_args()
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        parser.error('No supported files matched the inputs')
+
+    from services.database import Database
+    db = Database(
+        dbname=Config.DB_NAME,
+        user=Config.DB_USER,
+        password=Config.DB_PASSWORD,
+        host=Config.DB_HOST,
+        port=Config.DB_PORT
+    )
+    use_cache = not args.no_cache and Config.CLEANED_CACHE_ENTRIES > 0
+    cache = FrameCache(Config.CLEANED_CACHE_FOLDER, max_entries=Config.CLEANED_CACHE_ENTRIES) if use_cache else None
+    batch_name = f"batch_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{len(paths)}_files"
+
+    print(f"Ingesting {len(paths)} files as {batch_name}", flush=True)
+    try:
+        summary = ingest_batch(
+            paths, db, batch_name,
+            workers=args.workers,
+            incremental=args.mode == 'append',
+            engine=args.engine,
+            layout=args.layout,
+            cache=cache
+        )
+    except Exception as e:
+        db.update_file_status(batch_name, 'Failed', str(e))
+        print(f"Batch failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+    print(f"Loaded {summary['loaded_rows']:,} rows from {summary['files']} files "
+          f"({summary['input_mb']:.1f} MB) in {summary['total_seconds']:.2f}s")
+    print(f"  read+clean {summary['clean_seconds']:.2f}s "
+          f"({summary['cleaned_rows'] / summary['clean_seconds']:,.0f} rows/s, "
+          f"{summary['input_mb'] / summary['clean_seconds']:.1f} MB/s)")
+    print(f"  load+analyze {summary['load_seconds']:.2f}s "
+          f"({summary['loaded_rows'] / summary['load_seconds']:,.0f} rows/s)")
+    print(f"  overall {summary['loaded_rows'] / summary['total_seconds']:,.0f} rows/s")
+    if summary['failed']:
+        print(f"{len(summary['failed'])} files failed:")
+        for path, error in summary['failed'].items():
+            print(f"  {path}: {error}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,54 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Union
+import csv
 import os
 from datetime import datetime
+from services.aggregation import aggregate_lines
+from services.basket_analysis import basket_rules, pair_affinity
+from services.frame_cache import FrameCache
+from services.layout_model import LayoutClusterModel
+from services.profiler import frame_memory
+from services.shelf_placement import ShelfPlacement, fit_to_capacities, section_capacities
 
 class DataProcessor:
-    def __init__(self, file_path: str, db):
+    # Text columns read as strings so pandas does not infer types for them
+    text_columns = [
+        'Order ID', 'Ship Mode', 'Customer ID', 'Customer Name', 'Segment',
+        'Country/Region', 'City', 'State/Province', 'Postal Code', 'Region',
+        'Product ID', 'Sub-Category', 'Product Name'
+    ]
+    txt_delimiters = [',', '\t', '|', ';']
+    # 'auto' reads workbooks with calamine when python-calamine is installed, openpyxl/xlrd otherwise
+    excel_engines = ('auto', 'calamine', 'openpyxl')
+    sniff_sample_bytes = 64 * 1024
+    # 'pandas' analyzes the uploaded frame, 'sql' recomputes over every stored line
+    analytics_engines = ('pandas', 'sql')
+    # Item column used for each basket aggregation level
+    basket_levels = {'product': 'Product Name', 'sub_category': 'Sub-Category'}
+    # Store sections allowed by the layout_recommendations.section CHECK
+    max_sections = 30
+    # 'cluster' groups products by KMeans cluster, 'affinity' co-locates co-purchased products
+    layout_strategies = ('cluster', 'affinity')
+
+    def __init__(self, file_path: str, db, chunk_size: Optional[int] = None, incremental: bool = False,
+                 n_clusters: int = 4, model_path: Optional[str] = None, cache: Optional[FrameCache] = None,
+                 cleaned: Optional[pd.DataFrame] = None, sections_per_cluster: int = 4,
+                 excel_engine: str = 'auto', sheet: Union[int, str] = 0, report_memory: bool = False):
+        if n_clusters * sections_per_cluster > self.max_sections:
+            raise ValueError(
+                f"{n_clusters} clusters x {sections_per_cluster} sections exceed the {self.max_sections} store sections"
+            )
         self.file_path = file_path
         self.db = db
+        # Incremental uploads are merged into the stored history instead of replacing it
+        self.incremental = incremental
+        # Layout clustering; the fitted model is persisted at model_path when set
+        self.n_clusters = n_clusters
+        self.sections_per_cluster = sections_per_cluster
+        self.model_path = model_path
+        self._new_line_keys = []
+        self._new_products = 0
         self.required_columns = [
             'Row ID', 'Order ID', 'Order Date', 'Ship Date', 'Ship Mode',
             'Customer ID', 'Customer Name', 'Segment', 'Country/Region',
@@ -19,177 +56,470 @@ class DataProcessor:
             'Product ID', 'Sub-Category', 'Product Name',
             'Sales', 'Quantity', 'Discount', 'Profit'
         ]
+        # Repeated text columns stored as categoricals in the cleaned frame: the labels are kept once
+        # and every line holds an integer code (IDs and names repeat on every line of an order/product)
+        self.categorical_columns = [
+            'Ship Mode', 'Segment', 'Country/Region', 'Region', 'Sub-Category', 'State/Province', 'City',
+            'Postal Code', 'Customer ID', 'Customer Name', 'Product ID', 'Product Name', 'Order ID'
+        ]
+        # Integer columns downcast to the narrowest type holding their values; money stays float64
+        self.integer_columns = ['Row ID', 'Quantity']
+        # Cleaned frame size as objects vs compacted, filled in when report_memory is set
+        self.report_memory = report_memory
+        self.memory_report = None
+        # Share of co-purchase affinity kept within sections, filled in by the affinity layout strategy
+        self.colocated_share = None
+        # Cleaned frame is computed once and shared by every downstream step
+        self._cleaned_df = None
+        self._cleaned_source = None
+        # Grouped totals of the cleaned frame, shared by analyze_data and generate_layout_recommendations
+        self._aggregates = None
+        self._aggregates_source = None
+        # CSV/TXT files are streamed in chunks of this many rows when set
+        self.file_ext = os.path.splitext(file_path)[1].lower()
+        self.chunk_size = chunk_size if self.file_ext in ('.csv', '.txt') and cleaned is None else None
+        self.delimiter = None
+        # Workbook sheet (index or name) and reader used for .xlsx/.xls uploads
+        if excel_engine not in self.excel_engines:
+            raise ValueError(f"Invalid Excel engine: {excel_engine}. Must be one of {', '.join(self.excel_engines)}.")
+        self.excel_engine = excel_engine
+        self.sheet = sheet
+        # A cached cleaned frame of identical content lets the upload skip parsing entirely
+        self.cache = cache
+        self.cache_key = None
+        self.cache_hit = False
         # Log the file upload attempt
         self.db.add_file_history(os.path.basename(file_path))
         try:
-            self.df = self._read_file()
+            if cache:
+                # Each sheet of a workbook is cleaned into its own entry
+                variant = f"sheet_{sheet}" if self.file_ext in ('.xlsx', '.xls') and sheet != 0 else ''
+                self.cache_key = cache.content_key(file_path, variant)
+                self.cache_hit = cache.contains(self.cache_key)
+            # An already cleaned frame (e.g. a merged batch) skips reading; file_path only names the upload
+            self.df = None if self.streaming or self.cache_hit or cleaned is not None else self._read_file()
+            if cleaned is not None:
+                self._cleaned_df = cleaned
+                self._cleaned_source = self._source_signature()
+            if self.streaming:
+                # Validate the header without loading the file
+                self._read_csv(nrows=0)
             self.db.update_file_status(os.path.basename(file_path), 'Reading_Success')
         except Exception as e:
             self.db.update_file_status(os.path.basename(file_path), 'Reading_Failed', str(e))
             raise
 
+    @property
+    def streaming(self) -> bool:
+        return self.chunk_size is not None and not self.cache_hit
+
+    def _sniff_delimiter(self) -> str:
+        """Detect the TXT delimiter once from a small sample of the file."""
+        if self.delimiter is None:
+            with open(self.file_path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+                sample = f.read(self.sniff_sample_bytes)
+            try:
+                self.delimiter = csv.Sniffer().sniff(sample, delimiters=''.join(self.txt_delimiters)).delimiter
+            except csv.Error:
+                # Fall back to the candidate that splits the header into the most columns
+                header = sample.splitlines()[0] if sample else ''
+                self.delimiter = max(self.txt_delimiters, key=header.count)
+                if header.count(self.delimiter) == 0:
+                    raise ValueError("Could not parse TXT file with common delimiters")
+        return self.delimiter
+
+    def _read_csv(self, **kwargs):
+        """Read CSV/TXT with only the required columns and explicit text dtypes."""
+        delimiter = self._sniff_delimiter() if self.file_ext == '.txt' else ','
+        return pd.read_csv(
+            self.file_path,
+            sep=delimiter,
+            usecols=lambda col: col in self.required_columns,
+            dtype={col: str for col in self.text_columns},
+            **kwargs
+        )
+
     def _read_file(self) -> pd.DataFrame:
-        file_ext = os.path.splitext(self.file_path)[1].lower()
+        file_ext = self.file_ext
 
         try:
-            if file_ext == '.xlsx':
-                return pd.read_excel(self.file_path)
-            elif file_ext == '.xls':
-                return pd.read_excel(self.file_path, engine='xlrd')
-            elif file_ext == '.csv':
-                return pd.read_csv(self.file_path)
-            elif file_ext == '.txt':
-                delimiters = [',', '\t', '|', ';']
-                for delimiter in delimiters:
-                    try:
-                        df = pd.read_csv(self.file_path, delimiter=delimiter)
-                        if len(df.columns) > 1:
-                            return df
-                    except:
-                        continue
-                raise ValueError("Could not parse TXT file with common delimiters")
+            if file_ext in ('.xlsx', '.xls'):
+                return self._read_excel()
+            elif file_ext in ('.csv', '.txt'):
+                return self._read_csv()
             else:
                 raise ValueError(f"Unsupported file format: {file_ext}")
         except Exception as e:
             raise ValueError(f"Error reading file: {str(e)}")
 
-    def clean_data(self) -> pd.DataFrame:
+    def _read_excel(self) -> pd.DataFrame:
+        """Read the required columns of one sheet, with calamine when available."""
+        if self.excel_engine != 'openpyxl':
+            try:
+                return self._read_excel_calamine()
+            except ImportError:
+                if self.excel_engine == 'calamine':
+                    raise
+            except Exception as e:
+                if self.excel_engine == 'calamine':
+                    raise
+                print(f"Calamine could not read {self.file_path}, falling back to openpyxl/xlrd: {e}")
+
+        return pd.read_excel(
+            self.file_path,
+            sheet_name=self.sheet,
+            engine='xlrd' if self.file_ext == '.xls' else 'openpyxl',
+            usecols=lambda col: col in self.required_columns,
+            dtype={col: str for col in self.text_columns}
+        )
+
+    def _read_excel_calamine(self) -> pd.DataFrame:
+        """
+        Read a sheet with the Rust calamine parser and type it like read_excel with text dtypes:
+        empty cells become NaN and numbers in text columns (e.g. Postal Code) become integer strings.
+        """
+        from python_calamine import CalamineWorkbook
+
+        workbook = CalamineWorkbook.from_path(self.file_path)
+        if isinstance(self.sheet, str):
+            sheet = workbook.get_sheet_by_name(self.sheet)
+        else:
+            sheet = workbook.get_sheet_by_index(self.sheet)
+        rows = sheet.to_python()
+        if not rows:
+            return pd.DataFrame(columns=self.required_columns)
+
+        header = rows[0]
+        positions = {col: i for i, col in enumerate(header) if col in self.required_columns}
+        body = rows[1:]
+        df = pd.DataFrame({col: [row[i] for row in body] for col, i in positions.items()}, dtype=object)
+        # calamine returns '' for empty cells
+        df = df.mask(df.eq(''))
+
+        for col in self.text_columns:
+            if col not in df.columns or pd.api.types.infer_dtype(df[col], skipna=True) == 'string':
+                continue
+            values = df[col]
+            # Only number cells are rewritten; text cells such as '02134' keep their leading zeros
+            kinds = values.map(type)
+            numeric = kinds.isin([int, float])
+            numbers = pd.to_numeric(values.where(numeric), errors='coerce')
+            whole = numeric & (numbers % 1 == 0)
+            text = values.where(values.isna() | kinds.eq(str), values.astype(str))
+            text[whole] = numbers[whole].astype('int64').astype(str)
+            df[col] = text
+        return df
+
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """Yield the raw file in fixed-size chunks (streaming mode only)."""
         try:
-            missing_cols = [col for col in self.required_columns if col not in self.df.columns]
-            if missing_cols:
-                raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
-
-            cleaned_df = self.df[self.required_columns].copy()
-            cleaned_df = cleaned_df.drop_duplicates()
-            # cleaned_df = cleaned_df.dropna()
-
-            # Convert date columns to datetime
-            date_columns = ['Order Date', 'Ship Date']
-            for col in date_columns:
-                cleaned_df[col] = pd.to_datetime(cleaned_df[col])
+            yield from self._read_csv(chunksize=self.chunk_size)
+        except Exception as e:
+            raise ValueError(f"Error reading file: {str(e)}")
 
-            # Convert numeric columns
-            numeric_columns = ['Sales', 'Quantity', 'Discount', 'Profit']
-            for col in numeric_columns:
-                cleaned_df[col] = pd.to_numeric(cleaned_df[col], errors='coerce')
+    def _source_signature(self):
+        """Identify the current source so the cleaned frame can be invalidated when it changes."""
+        try:
+            stat = os.stat(self.file_path)
+            file_sig = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            # The upload may already be removed; fall back to the in-memory frame only
+            file_sig = None
+        return (id(self.df), file_sig)
+
+    def _clean_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Select, de-duplicate and type the required columns of a raw frame or chunk."""
+        missing_cols = [col for col in self.required_columns if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
+
+        cleaned_df = df[self.required_columns].copy()
+        cleaned_df = cleaned_df.drop_duplicates()
+        # cleaned_df = cleaned_df.dropna()
+
+        # Convert date columns to datetime
+        date_columns = ['Order Date', 'Ship Date']
+        for col in date_columns:
+            cleaned_df[col] = pd.to_datetime(cleaned_df[col])
+
+        # Convert numeric columns
+        numeric_columns = ['Row ID', 'Sales', 'Quantity', 'Discount', 'Profit']
+        for col in numeric_columns:
+            cleaned_df[col] = pd.to_numeric(cleaned_df[col], errors='coerce')
+
+        cleaned_df = cleaned_df.dropna()
+
+        # Typed columns shared by every downstream step
+        cleaned_df['Row ID'] = cleaned_df['Row ID'].astype('int64')
+        cleaned_df['Quantity'] = cleaned_df['Quantity'].astype('int64')
+        cleaned_df['Postal Code'] = cleaned_df['Postal Code'].astype(str)
+
+        return self._compact_frame(cleaned_df)
+
+    def _compact_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Store repeated text as categoricals and integers in their narrowest type, in place."""
+        before = frame_memory(df) if self.report_memory else None
+        for col in self.categorical_columns:
+            df[col] = df[col].astype('category')
+        for col in self.integer_columns:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+        if before is not None:
+            self.memory_report = {'rows': len(df), 'before': before, 'after': frame_memory(df)}
+        return df
+
+    def iter_cleaned_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        Yield cleaned chunks, dropping rows already seen in earlier chunks so the
+        result matches cleaning the whole file at once.
+        """
+        seen = np.empty(0, dtype='uint64')
+        for chunk in self.iter_chunks():
+            cleaned_chunk = self._clean_frame(chunk)
+            row_hashes = pd.util.hash_pandas_object(cleaned_chunk, index=False).to_numpy()
+            is_new = ~np.isin(row_hashes, seen)
+            seen = np.union1d(seen, row_hashes[is_new])
+            if is_new.any():
+                yield cleaned_chunk[is_new]
 
-            cleaned_df = cleaned_df.dropna()
+    def clean_data(self) -> pd.DataFrame:
+        """
+        Return the cleaned frame, computing it only once per source.
+        The returned frame is shared between callers and must be treated as read-only.
+        """
+        signature = self._source_signature()
+        if self._cleaned_df is not None and self._cleaned_source == signature:
+            return self._cleaned_df
 
-            self.db.update_file_status(os.path.basename(self.file_path), 'Cleaning_Success')
+        try:
+            cleaned_df = self.cache.get(self.cache_key) if self.cache_hit else None
+            if cleaned_df is None:
+                if self.cache_hit:
+                    # The entry was evicted since the upload was checked; parse the file after all
+                    self.cache_hit = False
+                    self.df = None if self.streaming else self._read_file()
+                cleaned_df = self._clean_source()
+                if self.cache:
+                    self._cache_cleaned_frame(cleaned_df)
+
+            self._keep_cleaned(cleaned_df, signature)
             return cleaned_df
         except Exception as e:
             self.db.update_file_status(os.path.basename(self.file_path), 'Cleaning_Failed', str(e))
             raise
 
+    def _keep_cleaned(self, cleaned_df: pd.DataFrame, signature):
+        """Memoize the cleaned frame for the given source and mark the upload as cleaned."""
+        self._cleaned_df = cleaned_df
+        self._cleaned_source = signature
+        if self.memory_report:
+            before, after = sum(self.memory_report['before'].values()), sum(self.memory_report['after'].values())
+            print(f"Cleaned frame: {len(cleaned_df):,} rows, {before / 2 ** 20:.1f} MB as objects, "
+                  f"{after / 2 ** 20:.1f} MB compacted ({before / max(after, 1):.1f}x smaller)")
+        self.db.update_file_status(os.path.basename(self.file_path), 'Cleaning_Success')
+
+    def aggregates(self) -> Dict[str, pd.DataFrame]:
+        """Per-order, per-sub-category and per-product totals of the cleaned frame, computed once."""
+        cleaned_df = self.clean_data()
+        if self._aggregates is None or self._aggregates_source is not cleaned_df:
+            self._aggregates = aggregate_lines(cleaned_df)
+            self._aggregates_source = cleaned_df
+        return self._aggregates
+
+    def _clean_source(self) -> pd.DataFrame:
+        """Clean the whole source file, chunk by chunk when streaming."""
+        if self.streaming:
+            chunks = list(self.iter_cleaned_chunks())
+            if not chunks:
+                return self._clean_frame(self._read_csv(nrows=0))
+            # Chunks have their own categories and integer widths, so concat widens them again
+            return self._compact_frame(pd.concat(chunks))
+        return self._clean_frame(self.df)
+
+    def _cache_cleaned_frame(self, cleaned_df: pd.DataFrame):
+        """Persist the cleaned frame for later uploads of the same content; failures only cost the speed-up."""
+        try:
+            self.cache.put(self.cache_key, cleaned_df)
+        except Exception as e:
+            print(f"Failed to cache cleaned data: {e}")
+
     def save_cleaned_data(self):
         """
         Save normalized data after storing customers, products, and sales.
+        In incremental mode the upload is merged into the existing tables instead of replacing them.
         """
         try:
-            # Clear previous data before inserting new data
-            self.db.clear_previous_data()
+            if not self.incremental:
+                # Clear previous data before inserting new data
+                self.db.clear_previous_data()
 
-            cleaned_df = self.clean_data()
+            # A frame cleaned earlier is loaded as is instead of streaming the file again
+            if self.streaming and self._cleaned_df is None:
+                self._save_cleaned_chunks()
+            else:
+                self._load_tables(self._customers_frame(), self._products_frame(), self.clean_data())
 
-            # Save customers data
-            customers_data = self.get_customers_data()
-            for customer in customers_data:
-                self.db.add_customer(customer)
-
-            # Save products data
-            products_data = self.get_products_data()
-            for product in products_data:
-                self.db.add_product(product)
-
-            # Save sales data
-            sales_data = self.get_sales_data()
-            for sale in sales_data:
-                self.db.add_sale(sale)
-
-            # Save normalized data
-            for _, row in cleaned_df.iterrows():
-                self.db.store_normalized_data({
-                    'order_id': row['Order ID'],
-                    'customer_id': row['Customer ID'],
-                    'product_id': row['Product ID'],
-                    'sub_category': row['Sub-Category'],
-                    'sales': float(row['Sales']),
-                    'quantity': int(row['Quantity']),
-                    'profit': float(row['Profit'])
-                })
+            self.db.refresh_rollups()
 
             self.db.update_file_status(os.path.basename(self.file_path), 'Processing_Success')
         except Exception as e:
             self.db.update_file_status(os.path.basename(self.file_path), 'Processing_Failed', str(e))
             raise
 
+    def _save_cleaned_chunks(self):
+        """
+        Clean and bulk-load the file chunk by chunk, so raw text is only ever held one chunk at a time.
+        The compacted cleaned chunks are kept and become the cleaned frame that analysis and layout
+        use, so the file is parsed once.
+        """
+        signature = self._source_signature()
+        seen_customers = set()
+        seen_products = set()
+        chunks = []
+        for cleaned_chunk in self.iter_cleaned_chunks():
+            customers = self._customers_frame(cleaned_chunk)
+            customers = customers[~customers['customer_id'].isin(seen_customers)]
+            seen_customers.update(customers['customer_id'])
+
+            products = self._products_frame(cleaned_chunk)
+            products = products[~products['product_id'].isin(seen_products)]
+            seen_products.update(products['product_id'])
+
+            self._load_tables(customers, products, cleaned_chunk)
+            chunks.append(cleaned_chunk)
+
+        if not chunks:
+            cleaned_df = self._clean_frame(self._read_csv(nrows=0))
+        else:
+            # Chunks have their own categories and integer widths, so concat widens them again
+            cleaned_df = self._compact_frame(pd.concat(chunks))
+        del chunks
+        if self.cache:
+            self._cache_cleaned_frame(cleaned_df)
+        self._keep_cleaned(cleaned_df, signature)
+
+    def _load_tables(self, customers: pd.DataFrame, products: pd.DataFrame, cleaned_df: pd.DataFrame):
+        """Bulk-load one cleaned frame or chunk, parents first so the sales foreign keys resolve."""
+        if not self.incremental:
+            # Bulk-load each table in a single transaction
+            self.db.bulk_insert('customers', customers)
+            self.db.bulk_insert('products', products)
+            self.db.bulk_insert('sales', self._sales_frame(cleaned_df))
+            self.db.bulk_insert('normalized_data', self._normalized_frame(cleaned_df))
+            return
+
+        # Upsert customers/products; append only lines whose (Order ID, Row ID) is not stored yet
+        self.db.bulk_upsert('customers', customers, ['customer_id'])
+        new_products = self.db.bulk_upsert('products', products, ['product_id'])
+        new_lines = self.db.bulk_upsert('sales', self._sales_frame(cleaned_df), ['order_id', 'row_id'], update=False)
+        self.db.bulk_upsert(
+            'normalized_data', self._normalized_frame(cleaned_df), ['order_id', 'row_id'], update=False
+        )
+        self._new_products += len(new_products)
+        self._new_line_keys.append(new_lines)
+
+    def _customers_frame(self, cleaned_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """One row per customer, with columns named as in the customers table."""
+        if cleaned_df is None:
+            cleaned_df = self.clean_data()
+        return cleaned_df.drop_duplicates(subset=['Customer ID'])[[
+            'Customer ID', 'Customer Name', 'Segment', 'Country/Region',
+            'Region', 'City', 'State/Province', 'Postal Code'
+        ]].rename(columns={
+            'Customer ID': 'customer_id',
+            'Customer Name': 'customer_name',
+            'Segment': 'segment',
+            'Country/Region': 'country',
+            'Region': 'region',
+            'City': 'city',
+            'State/Province': 'state_province',
+            'Postal Code': 'postal_code'
+        })
+
+    def _products_frame(self, cleaned_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """One row per product, with columns named as in the products table."""
+        if cleaned_df is None:
+            cleaned_df = self.clean_data()
+        return cleaned_df.drop_duplicates(subset=['Product ID'])[[
+            'Product ID', 'Sub-Category', 'Product Name'
+        ]].rename(columns={
+            'Product ID': 'product_id',
+            'Sub-Category': 'sub_category',
+            'Product Name': 'product_name'
+        })
+
+    def _sales_frame(self, cleaned_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Sales lines, with columns named as in the sales table."""
+        if cleaned_df is None:
+            cleaned_df = self.clean_data()
+        return cleaned_df[[
+            'Order ID', 'Row ID', 'Order Date', 'Ship Date', 'Customer ID', 'Product ID',
+            'Sales', 'Quantity', 'Discount', 'Profit'
+        ]].rename(columns={
+            'Order ID': 'order_id',
+            'Row ID': 'row_id',
+            'Order Date': 'order_date',
+            'Ship Date': 'ship_date',
+            'Customer ID': 'customer_id',
+            'Product ID': 'product_id',
+            'Sales': 'sales',
+            'Quantity': 'quantity',
+            'Discount': 'discount',
+            'Profit': 'profit'
+        })
+
+    def _normalized_frame(self, cleaned_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Normalized lines, with columns named as in the normalized_data table."""
+        if cleaned_df is None:
+            cleaned_df = self.clean_data()
+        return cleaned_df[[
+            'Order ID', 'Row ID', 'Order Date', 'Ship Date', 'Customer ID', 'Product ID', 'Sub-Category',
+            'Sales', 'Quantity', 'Profit'
+        ]].rename(columns={
+            'Order ID': 'order_id',
+            'Row ID': 'row_id',
+            'Order Date': 'order_date',
+            'Ship Date': 'ship_date',
+            'Customer ID': 'customer_id',
+            'Product ID': 'product_id',
+            'Sub-Category': 'sub_category',
+            'Sales': 'sales',
+            'Quantity': 'quantity',
+            'Profit': 'profit'
+        })
+
     def get_customers_data(self) -> List[Dict]:
-        cleaned_df = self.clean_data()
-        customers_data = []
-        for _, row in cleaned_df.drop_duplicates(subset=['Customer ID']).iterrows():
-            customer_data = {
-                'customer_id': row['Customer ID'],
-                'customer_name': row['Customer Name'],
-                'segment': row['Segment'],
-                'country': row['Country/Region'],
-                'region': row['Region'],
-                'city': row['City'],
-                'state_province': row['State/Province'],
-                'postal_code': str(row['Postal Code'])  # Convert to string for consistency
-            }
-            customers_data.append(customer_data)
-        return customers_data
+        return self._customers_frame().to_dict('records')
 
     def get_products_data(self) -> List[Dict]:
-        cleaned_df = self.clean_data()
-        products_data = []
-        for _, row in cleaned_df.drop_duplicates(subset=['Product ID']).iterrows():
-            product_data = {
-                'product_id': row['Product ID'],
-                'sub_category': row['Sub-Category'],  # Changed from 'Category' to 'Sub-Category'
-                'product_name': row['Product Name']
-            }
-            products_data.append(product_data)
-        return products_data
+        return self._products_frame().to_dict('records')
 
     def get_sales_data(self) -> List[Dict]:
-        cleaned_df = self.clean_data()
-        sales_data = []
-        for _, row in cleaned_df.iterrows():
-            sale_data = {
-                'order_id': row['Order ID'],
-                'customer_id': row['Customer ID'],
-                'product_id': row['Product ID'],
-                'sales': float(row['Sales']),
-                'quantity': int(row['Quantity']),
-                'discount': float(row['Discount']),
-                'profit': float(row['Profit'])
-            }
-            sales_data.append(sale_data)
-        return sales_data
-
-    def analyze_data(self) -> Dict:
+        return self._sales_frame().to_dict('records')
+
+    def analyze_data(self, engine: str = 'pandas') -> Dict:
+        if engine not in self.analytics_engines:
+            raise ValueError(f"Invalid analytics engine: {engine}. Must be one of {', '.join(self.analytics_engines)}.")
+        if engine == 'sql':
+            return self._analyze_sql()
+        if self.incremental:
+            return self._analyze_incremental()
         try:
             cleaned_df = self.clean_data()
+            aggregates = self.aggregates()
 
             metrics = {
                 'total_sales': float(cleaned_df['Sales'].sum()),
                 'total_profit': float(cleaned_df['Profit'].sum()),
-                'average_order_value': float(cleaned_df.groupby('Order ID')['Sales'].sum().mean()),
-                'total_orders': cleaned_df['Order ID'].nunique(),
-                'total_products': cleaned_df['Product ID'].nunique(),
+                'average_order_value': float(aggregates['orders']['Sales'].mean()),
+                'total_orders': len(aggregates['orders']),
+                'total_products': len(aggregates['products']),
                 'average_discount': float(cleaned_df['Discount'].mean()),
                 'profit_margin': float((cleaned_df['Profit'].sum() / cleaned_df['Sales'].sum()) * 100)
             }
 
             # Fix for sub-category analysis - no multi-index
             sub_category_analysis = {}
-            sub_category_metrics = cleaned_df.groupby('Sub-Category').agg({
-                'Sales': 'sum',
-                'Profit': 'sum',
-                'Quantity': 'sum',
-                'Discount': 'mean'
-            }).round(2)
+            sub_category_metrics = aggregates['sub_categories'][['Sales', 'Profit', 'Quantity', 'Discount']].round(2)
 
             for sub_category in sub_category_metrics.index:
                 sub_category_analysis[sub_category] = {
@@ -200,12 +530,9 @@ class DataProcessor:
                 }
 
             # Fix for product performance - handle multi-index properly
-            product_metrics = cleaned_df.groupby(['Product ID', 'Product Name']).agg({
-                'Sales': 'sum',
-                'Profit': 'sum',
-                'Quantity': 'sum',
-                'Discount': 'mean'
-            }).round(2).sort_values('Sales', ascending=False).head(10)
+            product_metrics = aggregates['products'].set_index('Product Name', append=True)[
+                ['Sales', 'Profit', 'Quantity', 'Discount']
+            ].round(2).sort_values('Sales', ascending=False).head(10)
 
             top_products = {}
             for (product_id, product_name) in product_metrics.index:
@@ -222,7 +549,9 @@ class DataProcessor:
             results = {
                 'metrics': metrics,
                 'sub_category_analysis': sub_category_analysis,  # Changed from category_analysis to sub_category_analysis
-                'top_products': top_products
+                'top_products': top_products,
+                # Running totals that later incremental uploads build on
+                'aggregate_state': self._aggregate_state(cleaned_df, aggregates)
             }
 
             # Store analysis results in database
@@ -232,65 +561,308 @@ class DataProcessor:
             self.db.update_file_status(os.path.basename(self.file_path), 'Analysis_Failed', str(e))
             raise
 
-    def generate_layout_recommendations(self) -> Dict:
+    def _aggregate_state(self, df: pd.DataFrame, aggregates: Dict[str, pd.DataFrame]) -> Dict:
+        """Additive totals from which the analysis results can be derived and updated."""
+        sub_category_metrics = aggregates['sub_categories']
+        product_metrics = aggregates['products'].rename(columns={'Product Name': 'product_name'}).nlargest(10, 'Sales')
+
+        return {
+            'lines': len(df),
+            'sales': float(df['Sales'].sum()),
+            'profit': float(df['Profit'].sum()),
+            'discount_sum': float(df['Discount'].sum()),
+            'orders': len(aggregates['orders']),
+            'products': len(aggregates['products']),
+            'sub_categories': {
+                str(sub_category): {
+                    'Sales': float(row.Sales),
+                    'Profit': float(row.Profit),
+                    'Quantity': int(row.Quantity),
+                    'discount_sum': float(row.discount_sum),
+                    'lines': int(row.lines)
+                }
+                for sub_category, row in zip(sub_category_metrics.index, sub_category_metrics.itertuples())
+            },
+            'top_products': {
+                product_id: {
+                    'product_name': row.product_name,
+                    'Sales': float(row.Sales),
+                    'Profit': float(row.Profit),
+                    'Quantity': int(row.Quantity),
+                    'Discount': float(row.Discount)
+                }
+                for product_id, row in zip(product_metrics.index, product_metrics.itertuples())
+            }
+        }
+
+    def _merge_state(self, state: Dict, new_lines: pd.DataFrame) -> Dict:
+        """Add the lines appended by this upload to the previously stored totals."""
+        new_aggregates = aggregate_lines(new_lines)
+        delta = self._aggregate_state(new_lines, new_aggregates)
+        merged = {
+            'lines': state['lines'] + delta['lines'],
+            'sales': state['sales'] + delta['sales'],
+            'profit': state['profit'] + delta['profit'],
+            'discount_sum': state['discount_sum'] + delta['discount_sum'],
+            'products': state['products'] + self._new_products,
+            'sub_categories': {name: dict(values) for name, values in state['sub_categories'].items()}
+        }
+
+        for name, values in delta['sub_categories'].items():
+            totals = merged['sub_categories'].setdefault(
+                name, {'Sales': 0.0, 'Profit': 0.0, 'Quantity': 0, 'discount_sum': 0.0, 'lines': 0}
+            )
+            for field, value in values.items():
+                totals[field] += value
+
+        # An order is new when every stored line of it arrived with this upload
+        new_order_lines = new_aggregates['orders']['lines']
+        stored_order_lines = self.db.count_order_lines(new_order_lines.index.tolist())
+        merged['orders'] = state['orders'] + int(sum(
+            stored_order_lines.get(order_id, 0) == count for order_id, count in new_order_lines.items()
+        ))
+
+        # Only touched products can change rank, so their new totals plus the old top list are enough
+        touched = self.db.fetch_product_totals(new_lines['Product ID'].unique().tolist())
+        candidates = {**state['top_products'], **touched}
+        merged['top_products'] = dict(
+            sorted(candidates.items(), key=lambda item: item[1]['Sales'], reverse=True)[:10]
+        )
+        return merged
+
+    def _results_from_state(self, state: Dict) -> Dict:
+        """Derive the analysis result structures from running totals."""
+        metrics = {
+            'total_sales': state['sales'],
+            'total_profit': state['profit'],
+            'average_order_value': state['sales'] / state['orders'] if state['orders'] else 0.0,
+            'total_orders': state['orders'],
+            'total_products': state['products'],
+            'average_discount': state['discount_sum'] / state['lines'] if state['lines'] else 0.0,
+            'profit_margin': state['profit'] / state['sales'] * 100 if state['sales'] else 0.0
+        }
+
+        sub_category_analysis = {
+            name: {
+                'Sales': round(values['Sales'], 2),
+                'Profit': round(values['Profit'], 2),
+                'Quantity': float(values['Quantity']),
+                'Discount': round(values['discount_sum'] / values['lines'], 2)
+            }
+            for name, values in sorted(state['sub_categories'].items())
+        }
+
+        top_products = {
+            f"{product_id}_{values['product_name']}": {
+                'product_id': product_id,
+                'product_name': values['product_name'],
+                'Sales': round(values['Sales'], 2),
+                'Profit': round(values['Profit'], 2),
+                'Quantity': float(values['Quantity']),
+                'Discount': round(values['Discount'], 2)
+            }
+            for product_id, values in state['top_products'].items()
+        }
+
+        return {
+            'metrics': metrics,
+            'sub_category_analysis': sub_category_analysis,
+            'top_products': top_products,
+            'aggregate_state': state
+        }
+
+    def _analyze_incremental(self) -> Dict:
+        """Update the stored analysis with the lines appended by this upload instead of recomputing it."""
+        try:
+            cleaned_df = self.clean_data()
+            new_keys = pd.concat(self._new_line_keys) if self._new_line_keys else pd.DataFrame(
+                columns=['order_id', 'row_id']
+            )
+            new_lines = cleaned_df.drop_duplicates(subset=['Order ID', 'Row ID']).merge(
+                new_keys.rename(columns={'order_id': 'Order ID', 'row_id': 'Row ID'}).astype(
+                    {'Order ID': str, 'Row ID': 'int64'}
+                ),
+                on=['Order ID', 'Row ID']
+            )
+
+            previous = self.db.fetch_aggregate_state()
+            state = self._merge_state(previous, new_lines) if previous else None
+            if state is None or state['lines'] != self.db.count_sales_lines():
+                # No usable running totals (first run or a failed earlier upload): rebuild them in SQL
+                state = self.db.compute_aggregate_state()
+
+            results = self._results_from_state(state)
+            self.db.store_analysis_results(results)
+            return results
+        except Exception as e:
+            self.db.update_file_status(os.path.basename(self.file_path), 'Analysis_Failed', str(e))
+            raise
+
+    def _analyze_sql(self) -> Dict:
+        """Compute the analysis over the whole stored history in the database; the upload is not re-read."""
+        try:
+            results = self.db.compute_analytics()
+            results['aggregate_state'] = self.db.compute_aggregate_state()
+            self.db.store_analysis_results(results)
+            return results
+        except Exception as e:
+            self.db.update_file_status(os.path.basename(self.file_path), 'Analysis_Failed', str(e))
+            raise
+
+    def generate_layout_recommendations(self, strategy: str = 'cluster', section_capacity: int = 0) -> Dict:
+        """
+        Assign every product a section and priority and store them.
+        section_capacity limits the products per section (0 splits them evenly over the store sections);
+        appended uploads share it with the products the current layout carries over.
+        """
+        if strategy not in self.layout_strategies:
+            raise ValueError(f"Invalid layout strategy: {strategy}. Must be one of {', '.join(self.layout_strategies)}.")
         try:
             cleaned_df = self.clean_data()
 
-            # Calculate metrics using Sub-Category instead of Category
-            product_metrics = cleaned_df.groupby('Product ID').agg({
-                'Product Name': 'first',  # Take the first product name
-                'Sub-Category': 'first',  # Use Sub-Category instead of Category
-                'Sales': 'sum',
-                'Profit': 'sum',
-                'Quantity': 'sum',
-                'Discount': 'mean',
-            }).reset_index()
-
-            scaler = StandardScaler()
-            features = scaler.fit_transform(product_metrics[['Sales', 'Profit', 'Quantity', 'Discount']])
-
-            kmeans = KMeans(n_clusters=4, random_state=42)
-            product_metrics['cluster'] = kmeans.fit_predict(features)
-
-            recommendations = {}
-            for _, row in product_metrics.iterrows():
-                section = (row['cluster'] * 4) + (len(recommendations) % 4)
-                recommendations[row['Product ID']] = {
-                    'product_name': row['Product Name'],
-                    'sub_category': row['Sub-Category'],  # Ensure Sub-Category is included
-                    'section': int(section),  # Ensure section is an integer
-                    'priority': 'high' if row['Profit'] > product_metrics['Profit'].median() else 'medium'
+            # Per-product totals shared with analyze_data (first name and Sub-Category of each product)
+            product_metrics = self.aggregates()['products'][[
+                'Product Name', 'Sub-Category', 'Sales', 'Profit', 'Quantity', 'Discount'
+            ]].reset_index()
+            median_profit = product_metrics['Profit'].median()
+            occupied = None
+            if self.incremental:
+                product_metrics, median_profit = self._cumulative_product_metrics(product_metrics, median_profit)
+                occupied = self._carried_section_loads(product_metrics)
+            capacities = section_capacities(len(product_metrics), self.max_sections, section_capacity, occupied)
+
+            if strategy == 'affinity':
+                sections = self._affinity_sections(cleaned_df, product_metrics, capacities)
+            else:
+                # Incremental uploads warm-start from the persisted model instead of refitting it; the model is
+                # updated with the touched products' cumulative totals, the same space replace uploads fit it in
+                with LayoutClusterModel.lock:
+                    model = LayoutClusterModel.load(self.n_clusters, self.model_path)
+                    if self.incremental:
+                        clusters = model.partial_fit_predict(product_metrics)
+                    else:
+                        clusters = model.fit_predict(product_metrics)
+                    cluster_ranks = model.cluster_ranks()
+                sales = product_metrics['Sales'].to_numpy()
+                sections = self._assign_sections(cluster_ranks[clusters], sales, section_capacity)
+                if occupied is not None:
+                    # Sections already hold the carried-over products; overflow moves to the nearest free space
+                    sections = fit_to_capacities(sections, sales, capacities)
+
+            # Build recommendations from column arrays rather than per-row Series
+            priorities = np.where(product_metrics['Profit'].to_numpy() > median_profit, 'high', 'medium')
+
+            recommendations = {
+                product_id: {
+                    'product_name': product_name,
+                    'sub_category': sub_category,  # Ensure Sub-Category is included
+                    'section': section,
+                    'priority': priority
                 }
+                for product_id, product_name, sub_category, section, priority in zip(
+                    product_metrics['Product ID'].tolist(),
+                    product_metrics['Product Name'].tolist(),
+                    product_metrics['Sub-Category'].tolist(),
+                    sections.tolist(),  # Python ints for the section column
+                    priorities.tolist()
+                )
+            }
 
-            # Store recommendations in the database
-            self.db.store_layout_recommendations(recommendations)
+            # Store the recommendations as the new layout run; append uploads keep the products they do not contain
+            self.db.store_layout_recommendations(recommendations, replace=not self.incremental)
             return recommendations
         except Exception as e:
             self.db.update_file_status(os.path.basename(self.file_path), 'Layout_Recommendation_Failed', str(e))
             raise
 
-    def market_basket_analysis(self) -> List[Dict]:
+    def _cumulative_product_metrics(self, product_metrics: pd.DataFrame, median_profit: float):
+        """
+        Replace the appended upload's per-product totals with the stored cumulative ones (product_rollup),
+        so touched products are clustered, ranked and prioritised on their whole history. Returns the
+        metrics and the median cumulative profit over every stored product.
+        """
+        totals = self.db.fetch_product_totals()
+        if not totals:
+            return product_metrics, median_profit
+        totals = pd.DataFrame.from_dict(totals, orient='index')
+        cumulative = totals.reindex(product_metrics['Product ID'].astype(str).to_numpy())
+
+        product_metrics = product_metrics.copy()
+        for col in LayoutClusterModel.feature_columns:
+            # A product missing from the rollup keeps this upload's totals
+            values = cumulative[col].to_numpy(dtype=np.float64)
+            product_metrics[col] = np.where(np.isnan(values), product_metrics[col].to_numpy(), values)
+        product_metrics['Quantity'] = product_metrics['Quantity'].astype(np.int64)
+        return product_metrics, totals['Profit'].median()
+
+    def _carried_section_loads(self, product_metrics: pd.DataFrame) -> np.ndarray:
+        """Products per section that the current layout run carries over into an appended one."""
+        loads = self.db.fetch_section_loads(product_metrics['Product ID'].astype(str).tolist()) or {}
+        occupied = np.zeros(self.max_sections, dtype=np.int64)
+        occupied[list(loads)] = list(loads.values())
+        return occupied
+
+    def _assign_sections(self, ranks: np.ndarray, sales: np.ndarray, capacity: int = 0) -> np.ndarray:
+        """
+        Give each cluster a block of consecutive sections, best-selling cluster first, and split its
+        products into equally sized sections by descending sales. A cluster gets sections_per_cluster
+        sections, more when it would otherwise exceed the per-section capacity (0 spreads the products
+        evenly over max_sections). When per-cluster blocks cannot fit the store, sections are filled
+        to capacity in cluster and sales order, so one section may hold the end of a cluster and the
+        start of the next.
+        """
+        n_products = len(ranks)
+        sections = np.empty(n_products, dtype=np.int64)
+        if n_products == 0:
+            return sections
+        capacity = int(section_capacities(n_products, self.max_sections, capacity)[0])
+
+        order = np.lexsort((-sales, ranks))
+        sorted_ranks = ranks[order]
+        sizes = np.bincount(ranks, minlength=self.n_clusters)
+        starts = np.cumsum(sizes) - sizes
+        position = np.arange(n_products) - starts[sorted_ranks]
+
+        needed = -(-sizes // capacity)
+        counts = np.maximum(needed, np.minimum(self.sections_per_cluster, sizes))
+        if counts.sum() > self.max_sections:
+            counts = needed
+        if counts.sum() > self.max_sections:
+            sections[order] = np.arange(n_products) // capacity
+            return sections
+
+        first_section = np.cumsum(counts) - counts
+        sections[order] = (first_section[sorted_ranks]
+                           + position * counts[sorted_ranks] // sizes[sorted_ranks])
+        return sections
+
+    def _affinity_sections(self, cleaned_df: pd.DataFrame, product_metrics: pd.DataFrame,
+                           capacities: np.ndarray) -> np.ndarray:
+        """Place products in the store sections so co-purchased products share a section, within capacities."""
+        affinity, item_names = pair_affinity(cleaned_df['Order ID'], cleaned_df['Product ID'])
+        # Reorder the affinity matrix to follow product_metrics rows
+        index = pd.Index(item_names).get_indexer(product_metrics['Product ID'])
+        affinity = affinity[index][:, index]
+
+        placement = ShelfPlacement(affinity, capacities)
+        sections = placement.place(product_metrics['Sales'].to_numpy())
+        self.colocated_share = placement.colocated_share()
+        return sections
+
+    def market_basket_analysis(self, level: str = 'product', min_support: float = 0.01,
+                               max_len: Optional[int] = None, min_lift: float = 1.0) -> List[Dict]:
         try:
-            transactions = self.df.groupby(['Order ID'])['Product Name'].apply(list).tolist()
-
-            te = TransactionEncoder()
-            te_ary = te.fit(transactions).transform(transactions)
-            df = pd.DataFrame(te_ary, columns=te.columns_)
+            if level not in self.basket_levels:
+                raise ValueError(f"Invalid basket level: {level}. Must be one of {', '.join(self.basket_levels)}.")
 
-            frequent_itemsets = apriori(df, min_support=0.01, use_colnames=True)
-            rules = association_rules(frequent_itemsets, metric="lift", min_threshold=1.0)
-
-            results = []
-            for _, rule in rules.iterrows():
-                results.append({
-                    'antecedents': list(rule['antecedents']),
-                    'consequents': list(rule['consequents']),
-                    'support': float(rule['support']),
-                    'confidence': float(rule['confidence']),
-                    'lift': float(rule['lift'])
-                })
-
-            return results
+            cleaned_df = self.clean_data()
+            return basket_rules(
+                cleaned_df['Order ID'],
+                cleaned_df[self.basket_levels[level]],
+                min_support=min_support,
+                max_len=max_len,
+                min_lift=min_lift
+            )
         except Exception as e:
             self.db.update_file_status(os.path.basename(self.file_path), 'Market_Basket_Analysis_Failed', str(e))
             raise
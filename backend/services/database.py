@@ -1,23 +1,123 @@
+import io
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import Json
-from typing import Dict, List
+from psycopg2 import sql
+from psycopg2.extras import Json, execute_values
+from psycopg2.extensions import cursor as base_cursor
+from psycopg2.pool import ThreadedConnectionPool
+import pandas as pd
+from datetime import date
+from typing import Dict, List, Optional
+from services.profiler import profile_write
+
+
+class CountingCursor(base_cursor):
+    """Cursor that counts the statements it sends to the server, per thread, for stage profiling."""
+    sent = threading.local()
+
+    @classmethod
+    def count(cls) -> int:
+        return getattr(cls.sent, 'count', 0)
+
+    def _bump(self):
+        CountingCursor.sent.count = CountingCursor.count() + 1
+
+    def execute(self, query, vars=None):
+        self._bump()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self._bump()
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        self._bump()
+        return super().copy_expert(sql, file, size)
+
 
 class Database:
-    def __init__(self, dbname: str, user: str, password: str, host: str, port: int = 5000):
+    # Materialized rollups, in refresh order
+    rollup_views = ['product_rollup', 'sub_category_rollup', 'region_rollup', 'daily_rollup']
+    # Buckets accepted by fetch_sales_series (date_trunc fields)
+    series_granularities = ('day', 'week', 'month', 'quarter', 'year')
+
+    def __init__(self, dbname: str, user: str, password: str, host: str, port: int = 5000,
+                 minconn: int = 1, maxconn: int = 10, health_check_interval: float = 30.0):
         try:
-            self.conn = psycopg2.connect(
-                dbname="retail",
-                user="postgres",
-                password="postgres",
-                host="localhost",
-                port=5000
+            self.pool = ThreadedConnectionPool(
+                minconn,
+                maxconn,
+                dbname=dbname,
+                user=user,
+                password=password,
+                host=host,
+                port=port,
+                cursor_factory=CountingCursor
             )
+            # ThreadedConnectionPool raises when exhausted; block callers instead
+            self._slots = threading.BoundedSemaphore(maxconn)
+            self._last_used = {}
+            self.health_check_interval = health_check_interval
             self.create_tables()
         except Exception as e:
             raise ValueError(f"Database initialization failed: {e}")
 
+    def close(self):
+        """Close every pooled connection."""
+        self.pool.closeall()
+
+    @staticmethod
+    def round_trips() -> int:
+        """Statements sent so far from the calling thread."""
+        return CountingCursor.count()
+
+    def _is_healthy(self, conn) -> bool:
+        """Ping connections that have been idle long enough to have been dropped by the server."""
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a pooled connection for one operation and return it afterwards.
+        Broken connections are discarded and replaced; any open transaction is rolled back on return.
+        """
+        self._slots.acquire()
+        conn = None
+        broken = False
+        try:
+            conn = self.pool.getconn()
+            if not self._is_healthy(conn):
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if conn is not None:
+                if not broken and not conn.closed:
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                self._last_used[id(conn)] = time.monotonic()
+                self.pool.putconn(conn, close=broken or bool(conn.closed))
+            self._slots.release()
+
     def create_tables(self):
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             # Customers Table
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS customers (
@@ -75,7 +175,7 @@ class Database:
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS layout_recommendations (
                     id SERIAL PRIMARY KEY,
-                    product_id TEXT REFERENCES products(product_id),
+                    product_id TEXT NOT NULL,
                     section INTEGER NOT NULL CHECK (section >= 0 AND section < 30),
                     priority TEXT CHECK (priority IN ('high', 'medium', 'low')),
                     sub_category TEXT NOT NULL,  -- Changed category to sub_category
@@ -83,22 +183,6 @@ class Database:
                 )
             """)
 
-            # Add Products per Section View - Changed category to sub_category
-            cur.execute("""
-                CREATE OR REPLACE VIEW section_products AS
-                SELECT 
-                    lr.section,
-                    lr.priority,
-                    lr.sub_category,  
-                    json_agg(json_build_object(
-                        'id', p.product_id,
-                        'name', p.product_name
-                    )) as products
-                FROM layout_recommendations as lr
-                JOIN products as p ON p.product_id = lr.product_id
-                GROUP BY lr.section, lr.priority, lr.sub_category
-            """)
-
             # Analytics Table
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS analysis_results (
@@ -121,11 +205,189 @@ class Database:
                 )
             """)
 
-            self.conn.commit()
+            # Incremental ingestion: line keys and running aggregates
+            cur.execute("ALTER TABLE sales ADD COLUMN IF NOT EXISTS row_id INTEGER")
+            cur.execute("ALTER TABLE normalized_data ADD COLUMN IF NOT EXISTS row_id INTEGER")
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS sales_order_row_key ON sales (order_id, row_id)")
+            cur.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS normalized_data_order_row_key
+                ON normalized_data (order_id, row_id)
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS sales_product_id_idx ON sales (product_id)")
+            cur.execute("ALTER TABLE analysis_results ADD COLUMN IF NOT EXISTS aggregate_state JSONB")
+
+            # Order and ship dates; lines arrive roughly in date order, so a BRIN range index stays tiny
+            cur.execute("ALTER TABLE sales ADD COLUMN IF NOT EXISTS order_date DATE")
+            cur.execute("ALTER TABLE sales ADD COLUMN IF NOT EXISTS ship_date DATE")
+            cur.execute("ALTER TABLE normalized_data ADD COLUMN IF NOT EXISTS order_date DATE")
+            cur.execute("ALTER TABLE normalized_data ADD COLUMN IF NOT EXISTS ship_date DATE")
+            cur.execute("CREATE INDEX IF NOT EXISTS sales_order_date_brin ON sales USING brin (order_date)")
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS normalized_data_order_date_brin ON normalized_data USING brin (order_date)
+            """)
+
+            # Dashboard lookups; sales(order_id) is served by the leading column of sales_order_row_key
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS normalized_data_sub_category_idx ON normalized_data (sub_category)
+            """)
+
+            # Layout runs: each store_layout_recommendations call writes a complete recommendation set under a
+            # new run and readers only see the latest committed run. Rows carry the product name and no foreign
+            # key, so the previous run stays readable while a replace-mode upload truncates products and reloads.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS layout_runs (
+                    id SERIAL PRIMARY KEY,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("ALTER TABLE layout_recommendations DROP CONSTRAINT IF EXISTS layout_recommendations_product_id_fkey")
+            cur.execute("ALTER TABLE layout_recommendations ADD COLUMN IF NOT EXISTS run_id INTEGER")
+            cur.execute("ALTER TABLE layout_recommendations ADD COLUMN IF NOT EXISTS product_name TEXT")
+            # Rows written before runs existed become run 0
+            cur.execute("SELECT EXISTS (SELECT 1 FROM layout_recommendations WHERE run_id IS NULL)")
+            if cur.fetchone()[0]:
+                cur.execute("INSERT INTO layout_runs (id) VALUES (0) ON CONFLICT DO NOTHING")
+                cur.execute("""
+                    UPDATE layout_recommendations lr
+                    SET run_id = 0, product_name = coalesce(
+                        (SELECT p.product_name FROM products p WHERE p.product_id = lr.product_id), lr.product_id
+                    )
+                    WHERE lr.run_id IS NULL
+                """)
+
+            # Keyset pages of the current run walk (section, product_id), optionally within one priority or sub-category
+            for index in ('section_idx', 'section_product_idx', 'priority_idx', 'sub_category_idx'):
+                cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(f"layout_recommendations_{index}")))
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS layout_recommendations_run_section_idx
+                ON layout_recommendations (run_id, section, product_id)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS layout_recommendations_run_priority_idx
+                ON layout_recommendations (run_id, priority, section, product_id)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS layout_recommendations_run_sub_category_idx
+                ON layout_recommendations (run_id, sub_category, section, product_id)
+            """)
+
+            # Products per section of the current run
+            cur.execute("""
+                CREATE OR REPLACE VIEW section_products AS
+                SELECT
+                    lr.section,
+                    lr.priority,
+                    lr.sub_category,
+                    json_agg(json_build_object(
+                        'id', lr.product_id,
+                        'name', lr.product_name
+                    )) as products
+                FROM layout_recommendations as lr
+                WHERE lr.run_id = (SELECT max(id) FROM layout_runs)
+                GROUP BY lr.section, lr.priority, lr.sub_category
+            """)
+
+            # Rollups, recomputed after each ingestion by refresh_rollups
+            cur.execute("""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS product_rollup AS
+                SELECT
+                    s.product_id,
+                    p.product_name,
+                    p.sub_category,
+                    sum(s.sales) AS sales,
+                    sum(s.profit) AS profit,
+                    sum(s.quantity) AS quantity,
+                    sum(s.discount) AS discount_sum,
+                    count(*) AS lines
+                FROM sales s
+                JOIN products p ON p.product_id = s.product_id
+                GROUP BY s.product_id, p.product_name, p.sub_category
+            """)
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS product_rollup_key ON product_rollup (product_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS product_rollup_sales_idx ON product_rollup (sales DESC)")
+
+            cur.execute("""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS sub_category_rollup AS
+                SELECT
+                    sub_category,
+                    sum(sales) AS sales,
+                    sum(profit) AS profit,
+                    sum(quantity) AS quantity,
+                    sum(discount_sum) AS discount_sum,
+                    sum(lines) AS lines,
+                    count(*) AS products
+                FROM product_rollup
+                GROUP BY sub_category
+            """)
+            cur.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS sub_category_rollup_key ON sub_category_rollup (sub_category)
+            """)
+
+            cur.execute("""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS region_rollup AS
+                SELECT
+                    c.region,
+                    sum(s.sales) AS sales,
+                    sum(s.profit) AS profit,
+                    sum(s.quantity) AS quantity,
+                    count(*) AS lines,
+                    count(DISTINCT s.order_id) AS orders,
+                    count(DISTINCT s.customer_id) AS customers
+                FROM sales s
+                JOIN customers c ON c.customer_id = s.customer_id
+                GROUP BY c.region
+            """)
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS region_rollup_key ON region_rollup (region)")
+
+            cur.execute("""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS daily_rollup AS
+                SELECT
+                    order_date,
+                    sum(sales) AS sales,
+                    sum(profit) AS profit,
+                    sum(quantity) AS quantity,
+                    count(*) AS lines,
+                    count(DISTINCT order_id) AS orders
+                FROM sales
+                GROUP BY order_date
+            """)
+            cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS daily_rollup_key ON daily_rollup (order_date)")
+
+            # Per-upload stage profile written by StageProfiler
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS pipeline_stages (
+                    id SERIAL PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    duration_s DOUBLE PRECISION NOT NULL,
+                    rows_in BIGINT,
+                    rows_out BIGINT,
+                    peak_rss_bytes BIGINT,
+                    db_round_trips INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS pipeline_stages_filename_idx ON pipeline_stages (filename)")
+
+            conn.commit()
+
+    @profile_write
+    def refresh_rollups(self):
+        """
+        Recompute the rollup views in one transaction so readers never see them out of step.
+        CONCURRENTLY (served by each view's unique index) lets readers keep querying the previous
+        contents instead of waiting on an ACCESS EXCLUSIVE lock until commit.
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            # sub_category_rollup reads product_rollup, so the order matters
+            for view in self.rollup_views:
+                cur.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(sql.Identifier(view)))
+            conn.commit()
 
     def add_customer(self, customer_data: Dict):
         """Add a customer record."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO customers (customer_id,customer_name, segment, country, region, city, state_province, postal_code)
                 VALUES (%s, %s, %s, %s, %s, %s, %s,%s)
@@ -139,11 +401,11 @@ class Database:
                 customer_data['state_province'],
                 customer_data['postal_code']
             ))
-            self.conn.commit()
+            conn.commit()
 
     def add_product(self, product_data: Dict):
         """Add a product record."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO products (product_id, sub_category, product_name)
                 VALUES (%s, %s, %s)
@@ -152,11 +414,11 @@ class Database:
                 product_data['sub_category'],  # Changed category to sub_category
                 product_data['product_name']
             ))
-            self.conn.commit()
+            conn.commit()
 
     def add_sale(self, sale_data: Dict):
         """Add a sale record."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO sales (order_id, customer_id, product_id, sales, quantity, discount, profit)
                 VALUES (%s, %s, %s, %s, %s, %s,%s)
@@ -169,11 +431,11 @@ class Database:
                 sale_data['discount'],
                 sale_data['profit']
             ))
-            self.conn.commit()
+            conn.commit()
 
     def store_normalized_data(self, normalized_data: Dict):
         """Store normalized data."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO normalized_data (order_id, customer_id, product_id, sub_category, sales, quantity, profit)
                 VALUES (%s, %s, %s, %s, %s, %s, %s)
@@ -186,45 +448,355 @@ class Database:
                 normalized_data['quantity'],
                 normalized_data['profit']
             ))
-            self.conn.commit()
+            conn.commit()
 
-    def store_layout_recommendations(self, recommendations: Dict):
-        """Store layout recommendations with product details."""
-        with self.conn.cursor() as cur:
-            # Validate section values
-            for product_id, data in recommendations.items():
-                if not (0 <= data['section'] <= 30):  # Check if section is within valid range
-                    raise ValueError(f"Invalid section value: {data['section']}. Must be between 0 and 30.")
+    def _copy_frame(self, cur, table: str, frame: pd.DataFrame, page_size: int = 10000):
+        """
+        Write a DataFrame into a table on the caller's transaction.
+        Frame columns must match the table's column names. Rows are streamed with
+        COPY FROM STDIN; if COPY is rejected, batched execute_values is used instead.
+        """
+        column_list = sql.SQL(', ').join(sql.Identifier(col) for col in frame.columns)
 
-                # Insert new recommendations
-                cur.execute("""
-                    INSERT INTO layout_recommendations 
-                    (product_id, section, priority, sub_category)
-                    VALUES (%s, %s, %s, %s)
-                """, (
-                    product_id,
-                    data['section'],
-                    data['priority'],
-                    data['sub_category']  # Changed category to sub_category
+        cur.execute("SAVEPOINT bulk_copy")
+        try:
+            buffer = io.StringIO()
+            frame.to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            copy_query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+                sql.Identifier(table), column_list
+            )
+            cur.copy_expert(copy_query.as_string(cur), buffer)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            raise
+        except psycopg2.Error as e:
+            print(f"COPY into {table} failed, falling back to batched inserts: {e}")
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_copy")
+            insert_query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+                sql.Identifier(table), column_list
+            )
+            execute_values(
+                cur,
+                insert_query.as_string(cur),
+                frame.itertuples(index=False, name=None),
+                page_size=page_size
+            )
+        cur.execute("RELEASE SAVEPOINT bulk_copy")
+
+    @profile_write
+    def bulk_insert(self, table: str, frame: pd.DataFrame, page_size: int = 10000) -> int:
+        """Load a DataFrame into a table in one transaction."""
+        if frame.empty:
+            return 0
+
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                self._copy_frame(cur, table, frame, page_size)
+            conn.commit()
+
+        return len(frame)
+
+    @profile_write
+    def bulk_upsert(self, table: str, frame: pd.DataFrame, key_columns: List[str],
+                    update: bool = True) -> pd.DataFrame:
+        """
+        Merge a DataFrame into a table in one transaction.
+        Rows are copied into a temporary staging table, then inserted with ON CONFLICT on
+        key_columns: existing rows are updated when update is True, otherwise left untouched.
+        Returns the keys of the rows that were newly inserted.
+        """
+        if frame.empty:
+            return pd.DataFrame(columns=key_columns)
+
+        stage = f"{table}_stage"
+        columns = list(frame.columns)
+        column_list = sql.SQL(', ').join(sql.Identifier(col) for col in columns)
+        key_list = sql.SQL(', ').join(sql.Identifier(col) for col in key_columns)
+        update_columns = [col for col in columns if col not in key_columns]
+        if update and update_columns:
+            conflict_action = sql.SQL("DO UPDATE SET {}").format(sql.SQL(', ').join(
+                sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(col)) for col in update_columns
+            ))
+        else:
+            conflict_action = sql.SQL("DO NOTHING")
+
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                # Column types only: no defaults, so staging does not draw from the table's sequences
+                cur.execute(sql.SQL(
+                    "CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA"
+                ).format(sql.Identifier(stage), column_list, sql.Identifier(table)))
+                self._copy_frame(cur, stage, frame)
+                # DISTINCT ON keeps one row per key; ON CONFLICT cannot touch a row twice
+                # xmax = 0 only for freshly inserted rows, not for updated ones
+                cur.execute(sql.SQL("""
+                    INSERT INTO {table} ({columns})
+                    SELECT DISTINCT ON ({keys}) {columns} FROM {stage}
+                    ON CONFLICT ({keys}) {action}
+                    RETURNING {keys}, (xmax = 0) AS inserted
+                """).format(
+                    table=sql.Identifier(table),
+                    columns=column_list,
+                    keys=key_list,
+                    stage=sql.Identifier(stage),
+                    action=conflict_action
                 ))
-            self.conn.commit()
+                rows = cur.fetchall()
+            conn.commit()
+
+        returned = pd.DataFrame(rows, columns=key_columns + ['inserted'])
+        return returned.loc[returned['inserted'], key_columns].reset_index(drop=True)
+
+    @profile_write
+    def store_layout_recommendations(self, recommendations: Dict, replace: bool = True) -> int:
+        """
+        Store the recommendations as a new layout run and make it current in one transaction.
+        With replace the run holds exactly the given products; otherwise products of the current
+        run that are not given are carried over. Readers filter on the latest committed run, so they
+        see either the previous layout or the new one. Earlier runs are deleted in the same transaction.
+        """
+        if not recommendations:
+            return 0
 
+        frame = pd.DataFrame.from_dict(recommendations, orient='index')[
+            ['product_name', 'section', 'priority', 'sub_category']
+        ]
+        frame = frame.rename_axis('product_id').reset_index()
+
+        # Validate section values against the table's CHECK before touching the table
+        invalid = frame[(frame['section'] < 0) | (frame['section'] >= 30)]
+        if not invalid.empty:
+            raise ValueError(f"Invalid section value: {invalid['section'].iloc[0]}. Must be between 0 and 29.")
+
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                # Runs are written one at a time so carried-over rows come from the latest run; reads are not blocked
+                cur.execute("LOCK TABLE layout_runs IN EXCLUSIVE MODE")
+                cur.execute("SELECT max(id) FROM layout_runs")
+                previous_run = cur.fetchone()[0]
+                cur.execute("INSERT INTO layout_runs DEFAULT VALUES RETURNING id")
+                run_id = cur.fetchone()[0]
+
+                frame.insert(0, 'run_id', run_id)
+                self._copy_frame(cur, 'layout_recommendations', frame)
+                if not replace and previous_run is not None:
+                    cur.execute("""
+                        INSERT INTO layout_recommendations
+                            (run_id, product_id, product_name, section, priority, sub_category)
+                        SELECT %s, product_id, product_name, section, priority, sub_category
+                        FROM layout_recommendations lr
+                        WHERE lr.run_id = %s AND NOT EXISTS (
+                            SELECT 1 FROM layout_recommendations n
+                            WHERE n.run_id = %s AND n.product_id = lr.product_id
+                        )
+                    """, (run_id, previous_run, run_id))
+
+                cur.execute("DELETE FROM layout_recommendations WHERE run_id < %s", (run_id,))
+                cur.execute("DELETE FROM layout_runs WHERE id < %s", (run_id,))
+                cur.execute("SELECT count(*) FROM layout_recommendations WHERE run_id = %s", (run_id,))
+                stored = cur.fetchone()[0]
+            conn.commit()
+
+        return stored
+
+    @profile_write
     def store_analysis_results(self, results: Dict):
         """Store analysis results."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
-                INSERT INTO analysis_results (metrics, sub_category_analysis, top_products)
-                VALUES (%s, %s, %s)
+                INSERT INTO analysis_results (metrics, sub_category_analysis, top_products, aggregate_state)
+                VALUES (%s, %s, %s, %s)
             """, (
                 Json(results['metrics']),
                 Json(results['sub_category_analysis']),  # Changed category_analysis to sub_category_analysis
-                Json(results.get('top_products', {}))
+                Json(results.get('top_products', {})),
+                Json(results['aggregate_state']) if results.get('aggregate_state') else None
             ))
-            self.conn.commit()
+            conn.commit()
+
+    def fetch_aggregate_state(self) -> Optional[Dict]:
+        """Fetch the running aggregates stored with the latest analysis, if any."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT aggregate_state FROM analysis_results
+                ORDER BY id DESC LIMIT 1
+            """)
+            row = cur.fetchone()
+            return row[0] if row else None
+
+    def compute_aggregate_state(self) -> Dict:
+        """Compute the running aggregates from the rollups of the stored sales lines."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT coalesce(sum(lines), 0), coalesce(sum(sales), 0), coalesce(sum(profit), 0),
+                       coalesce(sum(discount_sum), 0), coalesce(sum(products), 0)
+                FROM sub_category_rollup
+            """)
+            lines, sales, profit, discount_sum, products = cur.fetchone()
+
+            # Orders can span sub-categories, so they are counted on the lines themselves
+            cur.execute("SELECT count(DISTINCT order_id) FROM sales")
+            orders = cur.fetchone()[0]
+
+            cur.execute("""
+                SELECT sub_category, sales, profit, quantity, discount_sum, lines
+                FROM sub_category_rollup
+            """)
+            sub_categories = {
+                sub_category: {
+                    'Sales': float(sub_sales),
+                    'Profit': float(sub_profit),
+                    'Quantity': int(sub_quantity),
+                    'discount_sum': float(sub_discount),
+                    'lines': int(sub_lines)
+                }
+                for sub_category, sub_sales, sub_profit, sub_quantity, sub_discount, sub_lines in cur.fetchall()
+            }
+
+        return {
+            'lines': int(lines),
+            'sales': float(sales),
+            'profit': float(profit),
+            'discount_sum': float(discount_sum),
+            'orders': orders,
+            'products': int(products),
+            'sub_categories': sub_categories,
+            'top_products': self.fetch_product_totals(limit=10)
+        }
+
+    def compute_analytics(self, top_n: int = 10) -> Dict:
+        """
+        Compute the metrics, sub-category analysis and top products over every stored line in SQL.
+        Same structures as DataProcessor.analyze_data; reads the rollups kept current by refresh_rollups.
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT coalesce(sum(sales), 0), coalesce(sum(profit), 0), coalesce(sum(discount_sum), 0),
+                       coalesce(sum(lines), 0), count(*)
+                FROM product_rollup
+            """)
+            sales, profit, discount_sum, lines, products = cur.fetchone()
+
+            cur.execute("SELECT count(DISTINCT order_id) FROM sales")
+            orders = cur.fetchone()[0]
+
+            cur.execute("""
+                SELECT sub_category, round(sales, 2), round(profit, 2), quantity, round(discount_sum / lines, 2)
+                FROM sub_category_rollup
+                ORDER BY sub_category
+            """)
+            sub_category_analysis = {
+                sub_category: {
+                    'Sales': float(sub_sales),
+                    'Profit': float(sub_profit),
+                    'Quantity': float(sub_quantity),
+                    'Discount': float(sub_discount)
+                }
+                for sub_category, sub_sales, sub_profit, sub_quantity, sub_discount in cur.fetchall()
+            }
+
+            cur.execute("""
+                SELECT product_id, product_name, round(sales, 2), round(profit, 2), quantity,
+                       round(discount_sum / lines, 2)
+                FROM product_rollup
+                ORDER BY sales DESC
+                LIMIT %s
+            """, (top_n,))
+            top_products = {
+                f"{product_id}_{product_name}": {
+                    'product_id': product_id,
+                    'product_name': product_name,
+                    'Sales': float(product_sales),
+                    'Profit': float(product_profit),
+                    'Quantity': float(product_quantity),
+                    'Discount': float(product_discount)
+                }
+                for product_id, product_name, product_sales, product_profit, product_quantity, product_discount
+                in cur.fetchall()
+            }
+
+        sales, profit, discount_sum = float(sales), float(profit), float(discount_sum)
+        return {
+            'metrics': {
+                'total_sales': sales,
+                'total_profit': profit,
+                'average_order_value': sales / orders if orders else 0.0,
+                'total_orders': orders,
+                'total_products': products,
+                'average_discount': discount_sum / float(lines) if lines else 0.0,
+                'profit_margin': profit / sales * 100 if sales else 0.0
+            },
+            'sub_category_analysis': sub_category_analysis,
+            'top_products': top_products
+        }
+
+    def fetch_sales_series(self, start: Optional[date] = None, end: Optional[date] = None,
+                           granularity: str = 'month') -> List[Dict]:
+        """Sales, profit and quantity per period for order dates in [start, end], summed from the daily rollup."""
+        if granularity not in self.series_granularities:
+            raise ValueError(
+                f"Invalid granularity: {granularity}. Must be one of {', '.join(self.series_granularities)}."
+            )
+
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT date_trunc(%(granularity)s, order_date)::date AS period,
+                       sum(sales), sum(profit), sum(quantity), sum(orders)
+                FROM daily_rollup
+                WHERE order_date IS NOT NULL
+                  AND (%(start)s::date IS NULL OR order_date >= %(start)s::date)
+                  AND (%(end)s::date IS NULL OR order_date <= %(end)s::date)
+                GROUP BY period
+                ORDER BY period
+            """, {'granularity': granularity, 'start': start, 'end': end})
+            return [{
+                'period': period.isoformat(),
+                'sales': float(sales),
+                'profit': float(profit),
+                'quantity': int(quantity),
+                'orders': int(orders)
+            } for period, sales, profit, quantity, orders in cur.fetchall()]
+
+    def fetch_product_totals(self, product_ids: Optional[List[str]] = None, limit: Optional[int] = None) -> Dict:
+        """Fetch per-product sales totals, optionally for given products only or for the top sellers."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT product_id, product_name, sales, profit, quantity, discount_sum / lines
+                FROM product_rollup
+                WHERE %(product_ids)s::text[] IS NULL OR product_id = ANY(%(product_ids)s)
+                ORDER BY sales DESC
+                LIMIT %(limit)s
+            """, {'product_ids': product_ids, 'limit': limit})
+            return {
+                product_id: {
+                    'product_name': product_name,
+                    'Sales': float(sales),
+                    'Profit': float(profit),
+                    'Quantity': int(quantity),
+                    'Discount': float(discount)
+                }
+                for product_id, product_name, sales, profit, quantity, discount in cur.fetchall()
+            }
+
+    def count_sales_lines(self) -> int:
+        """Count all stored sales lines."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM sales")
+            return cur.fetchone()[0]
+
+    def count_order_lines(self, order_ids: List[str]) -> Dict:
+        """Count stored sales lines per order for the given orders."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT order_id, count(*) FROM sales
+                WHERE order_id = ANY(%s)
+                GROUP BY order_id
+            """, (order_ids,))
+            return dict(cur.fetchall())
 
     def fetch_normalized_data(self) -> List[Dict]:
         """Fetch all normalized data."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
                 SELECT * FROM normalized_data
             """)
@@ -241,18 +813,42 @@ class Database:
                 'created_at': row[8]
             } for row in rows]
 
+    def fetch_order_items(self, level: str = 'product') -> pd.DataFrame:
+        """
+        Fetch (order_id, item) pairs of the stored lines for basket analysis.
+        Items are product names or sub-categories; rows are streamed with COPY TO STDOUT.
+        """
+        queries = {
+            'product': """
+                SELECT n.order_id, p.product_name AS item
+                FROM normalized_data n
+                JOIN products p ON p.product_id = n.product_id
+            """,
+            'sub_category': """
+                SELECT order_id, sub_category AS item FROM normalized_data
+            """
+        }
+        if level not in queries:
+            raise ValueError(f"Invalid basket level: {level}. Must be one of {', '.join(queries)}.")
+
+        buffer = io.StringIO()
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.copy_expert(f"COPY ({queries[level]}) TO STDOUT WITH (FORMAT csv, HEADER)", buffer)
+        buffer.seek(0)
+        return pd.read_csv(buffer, dtype=str)
+
     def fetch_store_layout(self) -> Dict:
         """Fetch complete store layout data in the format needed by the frontend."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
-                SELECT 
+                SELECT
                     lr.product_id AS layout_product_id,
                     lr.section,
                     lr.priority,
-                    lr.sub_category, 
-                    p.product_name
+                    lr.sub_category,
+                    lr.product_name
                 FROM layout_recommendations lr
-                JOIN products p ON p.product_id = lr.product_id
+                WHERE lr.run_id = (SELECT max(id) FROM layout_runs)
                 ORDER BY lr.section, lr.priority
             """)
             rows = cur.fetchall()
@@ -272,6 +868,90 @@ class Database:
 
             return layout_data
 
+    def fetch_layout_page(self, section: Optional[int] = None, priority: Optional[str] = None,
+                          sub_category: Optional[str] = None, after: Optional[tuple] = None,
+                          limit: int = 100) -> Dict:
+        """
+        Fetch one page of layout recommendations ordered by (section, product_id).
+        after is the (section, product_id) of the last row of the previous page; the returned
+        'next' is None on the last page.
+        """
+        conditions = [sql.SQL("lr.run_id = (SELECT max(id) FROM layout_runs)")]
+        params = []
+        if section is not None:
+            conditions.append(sql.SQL("lr.section = %s"))
+            params.append(section)
+        if priority is not None:
+            conditions.append(sql.SQL("lr.priority = %s"))
+            params.append(priority)
+        if sub_category is not None:
+            conditions.append(sql.SQL("lr.sub_category = %s"))
+            params.append(sub_category)
+        if after is not None:
+            conditions.append(sql.SQL("(lr.section, lr.product_id) > (%s, %s)"))
+            params.extend(after)
+        where = sql.SQL("WHERE {}").format(sql.SQL(' AND ').join(conditions))
+
+        with self.connection() as conn, conn.cursor() as cur:
+            # One extra row tells whether another page follows
+            cur.execute(sql.SQL("""
+                SELECT lr.product_id, lr.section, lr.priority, lr.sub_category, lr.product_name
+                FROM layout_recommendations lr
+                {}
+                ORDER BY lr.section, lr.product_id
+                LIMIT %s
+            """).format(where), params + [limit + 1])
+            rows = cur.fetchall()
+
+        items = [{
+            'product_id': product_id,
+            'product_name': product_name,
+            'section': row_section,
+            'priority': row_priority,
+            'sub_category': row_sub_category
+        } for product_id, row_section, row_priority, row_sub_category, product_name in rows[:limit]]
+        has_more = len(rows) > limit
+        return {
+            'items': items,
+            'next': (items[-1]['section'], items[-1]['product_id']) if has_more else None
+        }
+
+    def fetch_layout_summary(self) -> List[Dict]:
+        """Product and priority counts and the most common sub-category of each section."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT
+                    section,
+                    count(*),
+                    count(*) FILTER (WHERE priority = 'high'),
+                    count(*) FILTER (WHERE priority = 'medium'),
+                    count(*) FILTER (WHERE priority = 'low'),
+                    mode() WITHIN GROUP (ORDER BY sub_category)
+                FROM layout_recommendations
+                WHERE run_id = (SELECT max(id) FROM layout_runs)
+                GROUP BY section
+                ORDER BY section
+            """)
+            return [{
+                'section': section,
+                'products': products,
+                'high': high,
+                'medium': medium,
+                'low': low,
+                'top_sub_category': top_sub_category
+            } for section, products, high, medium, low, top_sub_category in cur.fetchall()]
+
+    def fetch_section_loads(self, exclude_product_ids: List[str]) -> Dict[int, int]:
+        """Products per section in the current layout run, leaving out the given products."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT section, count(*)
+                FROM layout_recommendations
+                WHERE run_id = (SELECT max(id) FROM layout_runs) AND product_id <> ALL(%s)
+                GROUP BY section
+            """, (exclude_product_ids,))
+            return dict(cur.fetchall())
+
     def fetch_combined_store_data(self) -> Dict:
         """Fetch both layout and analytics data in a single query."""
         try:
@@ -291,13 +971,12 @@ class Database:
                 }
             }
         except Exception as e:
-            # Rollback to ensure the transaction state is clean
-            self.conn.rollback()
+            # The pooled connection is rolled back when it is returned
             raise Exception(f"Error fetching combined store data: {e}")
 
     def fetch_analysis_results(self) -> List[Dict]:
         """Fetch all analysis results."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
                 SELECT metrics, sub_category_analysis, top_products  
                 FROM analysis_results
@@ -310,46 +989,114 @@ class Database:
                 'top_products': row[2]
             } if row else {}
 
+    def fetch_data_version(self) -> str:
+        """
+        Return a token that changes whenever analysis results or a layout run are written.
+        Both tables use serial ids, so their maximums are a cheap index lookup.
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT
+                    (SELECT max(id) FROM analysis_results),
+                    (SELECT max(id) FROM layout_runs)
+            """)
+            analysis_id, layout_id = cur.fetchone()
+            return f"{analysis_id}-{layout_id}"
+
     def add_file_history(self, filename: str):
         """Log the file upload in the file history table."""
-        with self.conn.cursor() as cur:
+        with self.connection() as conn, conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO file_history (filename, status)
                 VALUES (%s, %s)
             """, (filename, 'Pending'))  # Set initial status as 'Pending'
-            self.conn.commit()
+            conn.commit()
 
     def update_file_status(self, filename: str, status: str, error_message: str = None):
         """Update the status of the uploaded file."""
         try:
-            with self.conn.cursor() as cur:
+            with self.connection() as conn, conn.cursor() as cur:
                 cur.execute("""
                     UPDATE file_history
                     SET status = %s, error_message = %s
                     WHERE filename = %s
                 """, (status, error_message, filename))
-                self.conn.commit()
+                conn.commit()
         except Exception as e:
             print(f"Error updating file status for {filename}: {e}")
-            self.conn.rollback()  # Rollback in case of an error
 
+    def fetch_file_status(self, filename: str) -> Dict:
+        """Fetch the latest status recorded for an uploaded file."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT status, error_message, created_at
+                FROM file_history
+                WHERE filename = %s
+                ORDER BY id DESC LIMIT 1
+            """, (filename,))
+            row = cur.fetchone()
+            return {
+                'status': row[0],
+                'error_message': row[1],
+                'created_at': row[2]
+            } if row else {}
+
+    def store_stage_metrics(self, filename: str, records: List[Dict]):
+        """Store the stage profile of one upload."""
+        with self.connection() as conn, conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO pipeline_stages
+                (filename, stage, status, duration_s, rows_in, rows_out, peak_rss_bytes, db_round_trips)
+                VALUES %s
+            """, [(
+                filename,
+                record['stage'],
+                record['status'],
+                record['duration_s'],
+                record['rows_in'],
+                record['rows_out'],
+                record['peak_rss_bytes'],
+                record['db_round_trips']
+            ) for record in records])
+            conn.commit()
+
+    def fetch_stage_metrics(self, filename: str) -> List[Dict]:
+        """Fetch the stage profile of an upload in execution order."""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT stage, status, duration_s, rows_in, rows_out, peak_rss_bytes, db_round_trips
+                FROM pipeline_stages
+                WHERE filename = %s
+                ORDER BY id
+            """, (filename,))
+            return [{
+                'stage': stage,
+                'status': status,
+                'duration_s': duration_s,
+                'rows_in': rows_in,
+                'rows_out': rows_out,
+                'peak_rss_bytes': peak_rss_bytes,
+                'db_round_trips': db_round_trips
+            } for stage, status, duration_s, rows_in, rows_out, peak_rss_bytes, db_round_trips in cur.fetchall()]
+
+    @profile_write
     def clear_previous_data(self):
         """
         Clears all data from the relevant tables except the file history table.
         """
         try:
-            # List of tables to clear (excluding 'file_history')
-            tables_to_clear = ['analysis_results', 'layout_recommendations', 'normalized_data', 'sales', 'products',
-                               'customers']
+            # List of tables to clear (excluding 'file_history'); the layout stays readable until the
+            # upload's new layout run replaces it
+            tables_to_clear = ['analysis_results', 'normalized_data', 'sales', 'products', 'customers']
 
-            for table in tables_to_clear:
-                with self.conn.cursor() as cur:
-                    # Corrected the query to properly include the table name
-                    cur.execute(f"DELETE FROM {table};")
-                    self.conn.commit()
+            # A single TRUNCATE avoids per-row foreign key checks over the previous upload
+            with self.connection() as conn, conn.cursor() as cur:
+                cur.execute(sql.SQL("TRUNCATE {};").format(
+                    sql.SQL(', ').join(sql.Identifier(table) for table in tables_to_clear)
+                ))
+                conn.commit()
 
             print("Data cleared successfully from the relevant tables.")
 
         except Exception as e:
             print(f"Error clearing previous data: {e}")
-            self.conn.rollback()  # Rollback in case of an error
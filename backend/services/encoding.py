@@ -0,0 +1,90 @@
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+
+# Faster serializers and brotli are used when installed; JSON and gzip always work
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+# Bodies of these types are compressed when the client accepts it
+COMPRESSIBLE_MIMETYPES = {JSON_MIMETYPE, MSGPACK_MIMETYPE, 'text/plain', 'text/csv'}
+# Fast settings: payloads are compressed per request
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def _fallback(value):
+    """Convert the numpy, Decimal and date values found in query results and frames."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def negotiate(accept_mimetypes) -> str:
+    """Pick msgpack when the client prefers it and it is installed, JSON otherwise."""
+    offers = [JSON_MIMETYPE, MSGPACK_MIMETYPE] if msgpack else [JSON_MIMETYPE]
+    # best_match prefers the first offer on equal quality, so */* still gets JSON
+    return accept_mimetypes.best_match(offers, default=JSON_MIMETYPE)
+
+
+def encode(payload, mimetype: str = JSON_MIMETYPE) -> bytes:
+    """Serialize a payload as JSON (orjson when installed) or msgpack."""
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(payload, default=_fallback, use_bin_type=True)
+    if orjson:
+        try:
+            return orjson.dumps(payload, default=_fallback, option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            # e.g. non-string keys; the standard encoder handles them
+            pass
+    return json.dumps(payload, default=_fallback).encode('utf-8')
+
+
+def compress_response(response, accept_encodings, min_bytes: int = 1024):
+    """Compress a buffered response with brotli or gzip according to Accept-Encoding."""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+
+    encoding = accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    else:
+        return response
+
+    response.headers['Content-Encoding'] = encoding
+    # The ETag names the uncompressed representation, so it can only be a weak validator now
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
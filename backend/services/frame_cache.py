@@ -0,0 +1,82 @@
+import glob
+import hashlib
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import tempfile
+from typing import Optional
+
+
+class FrameCache:
+    """
+    Cleaned frames stored as uncompressed Arrow IPC files keyed by the hash of the source file,
+    so identical content is parsed and cleaned only once. Files are memory-mapped on reload.
+    """
+    # Bump when cleaning changes so frames cleaned by older code are not reused
+    format_version = 3
+    hash_block_size = 1024 * 1024
+
+    def __init__(self, folder: str, max_entries: int = 8):
+        self.folder = folder
+        self.max_entries = max_entries
+
+    def content_key(self, file_path: str, variant: str = '') -> str:
+        """
+        Hash the file contents; the file name and upload time do not matter.
+        variant separates different frames read from the same file, such as workbook sheets.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(self.hash_block_size), b''):
+                digest.update(block)
+        return f"v{self.format_version}_{digest.hexdigest()}" + (f"_{variant}" if variant else '')
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, f"cleaned_{key}.arrow")
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Load a cached frame, or None if it is missing or unreadable."""
+        path = self._path(key)
+        try:
+            table = feather.read_table(path, memory_map=True)
+            # Keep recently used entries from being evicted first
+            os.utime(path)
+            return table.to_pandas()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable cache file {path}: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key: str, df: pd.DataFrame):
+        """Write a frame atomically and evict the least recently used entries beyond max_entries."""
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._path(key)
+        # A unique temporary file, so concurrent writers of the same key never share one
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=f"cleaned_{key}.", suffix='.tmp')
+        os.close(fd)
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        entries = sorted(glob.glob(os.path.join(self.folder, 'cleaned_*.arrow')), key=os.path.getmtime)
+        for path in entries[:max(len(entries) - self.max_entries, 0)]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
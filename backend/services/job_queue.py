@@ -0,0 +1,81 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+class JobQueue:
+    """
+    Run long processing jobs on a local worker pool and track their state in memory.
+    Finished jobs are forgotten after result_ttl seconds, oldest first beyond max_finished.
+    """
+
+    def __init__(self, max_workers: int = 1, result_ttl: float = 3600, max_finished: int = 100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.jobs: Dict[str, Dict] = {}
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        # Finished job ids in completion order, with their monotonic finish time
+        self.finished: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, func: Callable, *args, job_id: Optional[str] = None, **meta) -> str:
+        """Queue func(*args) and return the job id immediately."""
+        job_id = job_id or uuid.uuid4().hex
+        with self.lock:
+            self._prune()
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'result': None,
+                'error': None,
+                'created_at': datetime.utcnow().isoformat(),
+                'finished_at': None,
+                **meta
+            }
+        self.executor.submit(self._run, job_id, func, *args)
+        return job_id
+
+    def _run(self, job_id: str, func: Callable, *args):
+        self._update(job_id, status='running')
+        try:
+            result = func(*args)
+            self._update(job_id, status='completed', result=result)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self._update(job_id, status='failed', error=str(e))
+
+    def _update(self, job_id: str, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+            if fields.get('status') in ('completed', 'failed'):
+                self.jobs[job_id]['finished_at'] = datetime.utcnow().isoformat()
+                self.finished[job_id] = time.monotonic()
+                self._prune()
+
+    def _prune(self):
+        """Drop finished jobs past their TTL or beyond max_finished; the caller holds the lock."""
+        expired = time.monotonic() - self.result_ttl
+        while self.finished:
+            job_id, finished = next(iter(self.finished.items()))
+            if finished > expired and len(self.finished) <= self.max_finished:
+                break
+            del self.finished[job_id]
+            self.jobs.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a copy of the job record, or None for an unknown id."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of tracked jobs in each state."""
+        counts = {status: 0 for status in ('queued', 'running', 'completed', 'failed')}
+        with self.lock:
+            for job in self.jobs.values():
+                counts[job['status']] += 1
+        return counts
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import threading
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+from typing import Optional
+
+
+class LayoutClusterModel:
+    """
+    Scaler + MiniBatchKMeans pair used to cluster products for the store layout.
+    The fitted pair is persisted so incremental uploads only update it with the new product metrics.
+    """
+    feature_columns = ['Sales', 'Profit', 'Quantity', 'Discount']
+    # Uploads may run on several job workers; updates to the artifact are serialized
+    lock = threading.Lock()
+
+    def __init__(self, n_clusters: int = 4, path: Optional[str] = None, random_state: int = 42):
+        self.n_clusters = n_clusters
+        self.path = path
+        self.random_state = random_state
+        self.scaler = None
+        self.kmeans = None
+
+    @classmethod
+    def load(cls, n_clusters: int = 4, path: Optional[str] = None, **kwargs) -> 'LayoutClusterModel':
+        """Load the persisted model, or return an unfitted one if there is none for this cluster count."""
+        model = cls(n_clusters, path, **kwargs)
+        if path and os.path.exists(path):
+            try:
+                scaler, kmeans = joblib.load(path)
+                if kmeans.n_clusters == n_clusters:
+                    model.scaler, model.kmeans = scaler, kmeans
+            except Exception as e:
+                print(f"Ignoring unreadable layout model {path}: {e}")
+        return model
+
+    @property
+    def fitted(self) -> bool:
+        return self.kmeans is not None
+
+    def _features(self, product_metrics: pd.DataFrame) -> np.ndarray:
+        return product_metrics[self.feature_columns].to_numpy(dtype=np.float64)
+
+    def fit_predict(self, product_metrics: pd.DataFrame) -> np.ndarray:
+        """Fit a new scaler and model on all product metrics and return their clusters."""
+        features = self._features(product_metrics)
+        self.scaler = StandardScaler()
+        scaled = self.scaler.fit_transform(features)
+
+        # Full KMeans is faster than mini-batches on a single pass over the catalogue;
+        # its centers seed the MiniBatchKMeans that later uploads update
+        full = KMeans(n_clusters=self.n_clusters, random_state=self.random_state)
+        clusters = full.fit_predict(scaled)
+        self.kmeans = MiniBatchKMeans(
+            n_clusters=self.n_clusters,
+            init=full.cluster_centers_,
+            n_init=1,
+            random_state=self.random_state
+        )
+        self.kmeans.partial_fit(scaled)
+        self.save()
+        return clusters
+
+    def partial_fit_predict(self, product_metrics: pd.DataFrame) -> np.ndarray:
+        """Update the persisted scaler and model with newly arrived product metrics and return their clusters."""
+        if not self.fitted:
+            return self.fit_predict(product_metrics)
+
+        features = self._features(product_metrics)
+        self.scaler.partial_fit(features)
+        scaled = self.scaler.transform(features)
+        self.kmeans.partial_fit(scaled)
+        clusters = self.kmeans.predict(scaled)
+        self.save()
+        return clusters
+
+    def cluster_ranks(self) -> np.ndarray:
+        """Rank of each cluster by its center's sales, 0 for the best-selling cluster."""
+        # Scaling is monotonic per feature, so scaled centers order the same as raw sales
+        center_sales = self.kmeans.cluster_centers_[:, self.feature_columns.index('Sales')]
+        ranks = np.empty(self.n_clusters, dtype=np.int64)
+        ranks[np.argsort(-center_sales, kind='stable')] = np.arange(self.n_clusters)
+        return ranks
+
+    def save(self):
+        """Persist the scaler and model together, replacing the previous artifact atomically."""
+        if not self.path:
+            return
+        folder = os.path.dirname(self.path) or '.'
+        os.makedirs(folder, exist_ok=True)
+        # A unique temporary file, so processes saving at the same time never write into one file
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f"{os.path.basename(self.path)}.", suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump((self.scaler, self.kmeans), tmp_path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,189 @@
+import functools
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class PeakRss:
+    """Sample the resident set size on a background thread and keep the peak seen while active."""
+    interval = 0.005
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            # No procfs: fall back to the process-wide high-water mark (KiB on Linux)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def frame_memory(df) -> Dict[str, int]:
+    """Bytes held by each column of a DataFrame, string payloads and category labels included."""
+    return {str(col): int(size) for col, size in df.memory_usage(deep=True, index=False).items()}
+
+
+class MetricsRegistry:
+    """Process-wide stage totals rendered in the Prometheus text exposition format."""
+
+    def __init__(self, prefix: str = 'retail_pipeline'):
+        self.prefix = prefix
+        self.totals: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, record: Dict):
+        with self.lock:
+            totals = self.totals.setdefault(record['stage'], {
+                'count': 0, 'failures': 0, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+                'db_round_trips': 0, 'last_seconds': 0.0, 'last_peak_rss_bytes': 0
+            })
+            totals['count'] += 1
+            totals['failures'] += record['status'] != 'ok'
+            totals['seconds'] += record['duration_s']
+            totals['rows_in'] += record['rows_in'] or 0
+            totals['rows_out'] += record['rows_out'] or 0
+            totals['db_round_trips'] += record['db_round_trips'] or 0
+            totals['last_seconds'] = record['duration_s']
+            totals['last_peak_rss_bytes'] = record['peak_rss_bytes']
+
+    def render(self, gauges: Optional[Dict[str, Dict]] = None) -> str:
+        """Render stage metrics plus extra gauges given as {name: {'label': label_name, 'values': {label_value: value}}}."""
+        families = [
+            ('stage_duration_seconds', 'summary', 'Time spent in each pipeline stage.', None),
+            ('stage_runs_total', 'counter', 'Pipeline stage executions.', 'count'),
+            ('stage_failures_total', 'counter', 'Pipeline stage executions that raised.', 'failures'),
+            ('stage_rows_in_total', 'counter', 'Rows passed into each stage.', 'rows_in'),
+            ('stage_rows_out_total', 'counter', 'Rows produced by each stage.', 'rows_out'),
+            ('stage_db_round_trips_total', 'counter', 'Database statements issued by each stage.', 'db_round_trips'),
+            ('stage_last_duration_seconds', 'gauge', 'Duration of the latest run of each stage.', 'last_seconds'),
+            ('stage_last_peak_rss_bytes', 'gauge', 'Peak RSS during the latest run of each stage.',
+             'last_peak_rss_bytes'),
+        ]
+        with self.lock:
+            totals = {stage: dict(values) for stage, values in sorted(self.totals.items())}
+
+        lines = []
+        for name, metric_type, help_text, field in families:
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for stage, values in totals.items():
+                label = f'{{stage="{stage}"}}'
+                if field is None:
+                    lines.append(f"{metric}_sum{label} {values['seconds']}")
+                    lines.append(f"{metric}_count{label} {values['count']}")
+                else:
+                    lines.append(f"{metric}{label} {values[field]}")
+
+        for name, samples in (gauges or {}).items():
+            metric = f"{self.prefix}_{name}"
+            label_name, samples = samples['label'], samples['values']
+            lines.append(f"# TYPE {metric} gauge")
+            for label_value, value in sorted(samples.items()):
+                lines.append(f'{metric}{{{label_name}="{label_value}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Stage totals since the process started, served by /api/metrics
+metrics_registry = MetricsRegistry()
+
+
+class StageProfiler:
+    """
+    Record duration, rows in/out, peak RSS and DB round-trips for each stage of one upload.
+    While active on a thread, Database writes decorated with profile_write are recorded as nested stages.
+    """
+    _active = threading.local()
+
+    def __init__(self, db, filename: str, registry: MetricsRegistry = metrics_registry):
+        self.db = db
+        self.filename = filename
+        self.registry = registry
+        self.records: List[Dict] = []
+
+    @classmethod
+    def current(cls) -> Optional['StageProfiler']:
+        return getattr(cls._active, 'profiler', None)
+
+    def __enter__(self):
+        StageProfiler._active.profiler = self
+        return self
+
+    def __exit__(self, *exc):
+        StageProfiler._active.profiler = None
+        self.flush()
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        """Time the enclosed block; set record['rows_out'] inside it when known."""
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None, 'status': 'ok'}
+        # Appended up front so nested DB writes are listed after the stage that issued them
+        self.records.append(record)
+        rss = PeakRss()
+        start_trips = self.db.round_trips() or 0
+        start = time.perf_counter()
+        try:
+            with rss:
+                yield record
+        except Exception:
+            record['status'] = 'failed'
+            raise
+        finally:
+            record['duration_s'] = time.perf_counter() - start
+            record['peak_rss_bytes'] = rss.peak
+            record['db_round_trips'] = (self.db.round_trips() or 0) - start_trips
+            self.registry.observe(record)
+
+    def flush(self):
+        """Store the recorded stages in one write; profiling never fails the upload."""
+        if not self.records:
+            return
+        try:
+            self.db.store_stage_metrics(self.filename, self.records)
+        except Exception as e:
+            print(f"Failed to store stage metrics for {self.filename}: {e}")
+        self.records = []
+
+
+def profile_write(func):
+    """Record a Database write as a nested stage (db.<method>[<table>]) when an upload is being profiled."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        profiler = StageProfiler.current()
+        if profiler is None:
+            return func(self, *args, **kwargs)
+
+        table = args[0] if args and isinstance(args[0], str) else None
+        payload = next((arg for arg in args if not isinstance(arg, str) and hasattr(arg, '__len__')), None)
+        name = f"db.{func.__name__}" + (f"[{table}]" if table else '')
+        with profiler.stage(name, rows_in=len(payload) if hasattr(payload, '__len__') else None) as record:
+            result = func(self, *args, **kwargs)
+            if isinstance(result, int):
+                record['rows_out'] = result
+            elif hasattr(result, '__len__'):
+                record['rows_out'] = len(result)
+            return result
+    return wrapper
@@ -0,0 +1,36 @@
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    In-process cache of serialized responses keyed by a data version.
+    Only the latest version is kept per name, so a new version invalidates the old body.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[str, bytes, str]] = {}
+        self.lock = threading.Lock()
+
+    def get(self, name: str, version: str) -> Optional[Tuple[bytes, str]]:
+        """Return (body, etag) if the cached entry matches the version."""
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry and entry[0] == version:
+                return entry[1], entry[2]
+            return None
+
+    def set(self, name: str, version: str, body: bytes) -> Tuple[bytes, str]:
+        """Cache a body for a version and return it with its ETag."""
+        etag = hashlib.sha1(body).hexdigest()
+        with self.lock:
+            self.entries[name] = (version, body, etag)
+        return body, etag
+
+    def invalidate(self, name: Optional[str] = None):
+        with self.lock:
+            if name is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(name, None)
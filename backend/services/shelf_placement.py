@@ -0,0 +1,187 @@
+import time
+import numpy as np
+from scipy.sparse import csr_matrix
+from typing import Optional
+
+
+def section_capacities(n_products: int, n_sections: int, capacity: int = 0,
+                       occupied: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Products each section can hold: capacity each, or an even split of the products when capacity is 0.
+    occupied counts products already in each section (carried over by an append); they share the capacity
+    with the n_products being placed, and the space they leave is returned.
+    """
+    occupied = np.zeros(n_sections, dtype=np.int64) if occupied is None else np.asarray(occupied, dtype=np.int64)
+    total = n_products + int(occupied.sum())
+    if capacity <= 0:
+        capacity = max(-(-total // n_sections), 1)
+    if capacity * n_sections < total:
+        raise ValueError(f"{n_sections} sections of {capacity} products cannot hold {total} products")
+    free = np.clip(capacity - occupied, 0, None)
+    if free.sum() < n_products:
+        raise ValueError(
+            f"Sections over their capacity of {capacity} leave no room for {n_products} products; "
+            "replace the data to lay out the whole store again"
+        )
+    return free
+
+
+def fit_to_capacities(sections: np.ndarray, priority: np.ndarray, capacities: np.ndarray) -> np.ndarray:
+    """
+    Keep each product in its section while the section has room, higher priority first; the rest
+    move to the nearest section with room.
+    """
+    sections = np.asarray(sections, dtype=np.int64).copy()
+    order = np.lexsort((-np.asarray(priority, dtype=np.float64), sections))
+    sizes = np.bincount(sections, minlength=len(capacities))
+    starts = np.cumsum(sizes) - sizes
+    position = np.empty(len(sections), dtype=np.int64)
+    position[order] = np.arange(len(sections)) - starts[sections[order]]
+
+    overflow = position >= capacities[sections]
+    spare = capacities - np.minimum(sizes, capacities)
+    for product in order[overflow[order]]:
+        open_sections = np.flatnonzero(spare > 0)
+        target = open_sections[np.abs(open_sections - sections[product]).argmin()]
+        sections[product] = target
+        spare[target] -= 1
+    return sections
+
+
+class ShelfPlacement:
+    """
+    Assign products to capacity-limited sections so that frequently co-purchased products share a section.
+    A greedy pass places products by decreasing total affinity next to their already placed partners;
+    local search then moves or swaps products between sections while that raises the affinity kept
+    within sections. Products without affinity fill the remaining space by priority.
+    """
+    tolerance = 1e-12
+
+    def __init__(self, affinity: csr_matrix, capacities: np.ndarray, max_passes: int = 5,
+                 time_limit: Optional[float] = 10.0):
+        affinity = csr_matrix(affinity, dtype=np.float64)
+        affinity = affinity.maximum(affinity.T).tocsr()
+        affinity.setdiag(0)
+        affinity.eliminate_zeros()
+        affinity.sum_duplicates()
+        self.affinity = affinity
+        self.capacities = np.asarray(capacities, dtype=np.int64)
+        self.max_passes = max_passes
+        self.time_limit = time_limit
+
+        n_products, n_sections = affinity.shape[0], len(self.capacities)
+        if self.capacities.sum() < n_products:
+            raise ValueError(f"Section capacities ({self.capacities.sum()}) cannot hold {n_products} products")
+        self.sections = np.full(n_products, -1, dtype=np.int64)
+        self.load = np.zeros(n_sections, dtype=np.int64)
+        # gain[p, s]: affinity between product p and the products currently in section s
+        self.gain = np.zeros((n_products, n_sections))
+
+    def place(self, priority: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the section of every product; higher priority products without affinity go to lower sections."""
+        n_products = self.affinity.shape[0]
+        priority = np.zeros(n_products) if priority is None else np.asarray(priority, dtype=np.float64)
+        strength = np.asarray(self.affinity.sum(axis=1)).ravel()
+
+        linked = np.flatnonzero(strength > 0)
+        linked = linked[np.lexsort((-priority[linked], -strength[linked]))]
+        self._greedy(linked)
+
+        unlinked = np.flatnonzero(self.sections < 0)
+        unlinked = unlinked[np.argsort(-priority[unlinked], kind='stable')]
+        free_slots = np.repeat(np.arange(len(self.capacities)), self.capacities - self.load)
+        self.sections[unlinked] = free_slots[:len(unlinked)]
+        self.load += np.bincount(self.sections[unlinked], minlength=len(self.capacities))
+
+        self._local_search(linked)
+        return self.sections.copy()
+
+    def colocated_share(self) -> float:
+        """Share of the total pair affinity kept within sections by the current placement."""
+        total = self.affinity.sum()
+        if total == 0:
+            return 0.0
+        placed = self.sections >= 0
+        return float(self.gain[np.flatnonzero(placed), self.sections[placed]].sum() / total)
+
+    def _neighbours(self, product: int):
+        start, end = self.affinity.indptr[product], self.affinity.indptr[product + 1]
+        return self.affinity.indices[start:end], self.affinity.data[start:end]
+
+    def _shift(self, product: int, source: int, target: int):
+        """Move a product's contribution to the gain matrix from source to target (-1 for none)."""
+        neighbours, weights = self._neighbours(product)
+        if source >= 0:
+            self.gain[neighbours, source] -= weights
+        self.gain[neighbours, target] += weights
+        self.sections[product] = target
+
+    def _greedy(self, products: np.ndarray):
+        for product in products:
+            gains = np.where(self.load < self.capacities, self.gain[product], -np.inf)
+            target = int(gains.argmax())
+            if gains[target] <= 0:
+                # No placed partner with room: start in the emptiest section
+                target = int((self.capacities - self.load).argmax())
+            self._shift(product, -1, target)
+            self.load[target] += 1
+
+    def _local_search(self, products: np.ndarray):
+        n_sections = len(self.capacities)
+        # members[s] lists the products of section s; -1 marks a free slot, -2 a slot beyond capacity
+        members = np.full((n_sections, self.capacities.max()), -2, dtype=np.int64)
+        members[np.arange(members.shape[1]) < self.capacities[:, None]] = -1
+        order = np.argsort(self.sections, kind='stable')
+        starts = np.cumsum(self.load) - self.load
+        slot = np.empty(len(self.sections), dtype=np.int64)
+        slot[order] = np.arange(len(order)) - starts[self.sections[order]]
+        members[self.sections[order], slot[order]] = order
+
+        deadline = time.perf_counter() + self.time_limit if self.time_limit else None
+        for _ in range(self.max_passes):
+            improvement = 0.0
+            for visited, product in enumerate(products):
+                if deadline and visited % 1024 == 0 and time.perf_counter() > deadline:
+                    return
+                source = self.sections[product]
+                row = self.gain[product].copy()
+                row[source] = -np.inf
+                target = int(row.argmax())
+                delta = row[target] - self.gain[product, source]
+                if delta <= self.tolerance:
+                    continue
+
+                if self.load[target] < self.capacities[target]:
+                    free = int(np.flatnonzero(members[target] == -1)[0])
+                    members[source, slot[product]] = -1
+                    members[target, free] = product
+                    slot[product] = free
+                    self._shift(product, source, target)
+                    self.load[source] -= 1
+                    self.load[target] += 1
+                    improvement += delta
+                    continue
+
+                # Target is full: swap with the member whose own move back costs least
+                candidates = members[target]
+                partner_delta = np.where(
+                    candidates >= 0,
+                    self.gain[candidates, source] - self.gain[candidates, target],
+                    -np.inf
+                )
+                neighbours, weights = self._neighbours(product)
+                in_target = self.sections[neighbours] == target
+                partner_delta[slot[neighbours[in_target]]] -= 2 * weights[in_target]
+                best = int(partner_delta.argmax())
+                if delta + partner_delta[best] <= self.tolerance:
+                    continue
+
+                partner = int(candidates[best])
+                members[source, slot[product]], members[target, best] = partner, product
+                slot[product], slot[partner] = best, slot[product]
+                self._shift(product, source, target)
+                self._shift(partner, target, source)
+                improvement += delta + partner_delta[best]
+
+            if improvement <= self.tolerance or (deadline and time.perf_counter() > deadline):
+                break
@@ -124,6 +124,8 @@ import { formatCurrency } from '../lib/utils';
 const Dashboard: React.FC = () => {
   const [analyticsData, setAnalyticsData] = useState<any>(null);
   const [loading, setLoading] = useState(true);
+  // Bumped after each upload so components that fetch their own data reload it
+  const [dataVersion, setDataVersion] = useState(0);
 
   const loadAnalytics = async () => {
     try {
@@ -138,6 +140,7 @@ const Dashboard: React.FC = () => {
 
   const handleUploadComplete = () => {
     loadAnalytics();
+    setDataVersion((version) => version + 1);
   };
 
   const cardVariants = {
@@ -240,7 +243,7 @@ const Dashboard: React.FC = () => {
         className="grid grid-rows-1 lg:grid-rows-2 gap-8"
       >
         <div className="bg-gray-800/90 backdrop-blur-lg rounded-xl border border-blue-500/20 p-6 transition-all duration-300 hover:shadow-xl hover:border-blue-400/30">
-          <StoreLayout data={analyticsData?.data} loading={loading} />
+          <StoreLayout refreshKey={dataVersion} loading={loading} />
         </div>
         <div className="bg-gray-800/90 backdrop-blur-lg rounded-xl border border-green-500/20 p-6 transition-all duration-300 hover:shadow-xl hover:border-green-400/30">
           <SalesChart data={analyticsData?.analytics.sub_category_analysis} loading={loading} />
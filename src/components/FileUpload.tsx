@@ -191,7 +191,7 @@ const FileUpload: React.FC<FileUploadProps> = ({ onUploadComplete }) => {
       formData.append('file', file);
       
       await processDataFile(formData, (progress) => {
-        setProgress(`Uploading file... ${progress}%`);
+        setProgress(`Processing file... ${progress}%`);
       });
       toast.success('Data processed successfully!');
       setProgress('Data processed successfully!');
@@ -44,15 +44,41 @@
 // export default SalesChart;
 
 
-import React from 'react';
-import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
+import React, { useEffect, useState } from 'react';
+import {
+  BarChart, Bar, LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer
+} from 'recharts';
+import { fetchSalesSeries, SalesSeriesPoint, SeriesGranularity } from '../lib/api';
 
 interface SalesChartProps {
   data?: Record<string, { Sales: number; Profit: number; Quantity: number }>;
   loading?: boolean;
 }
 
+const GRANULARITIES: SeriesGranularity[] = ['week', 'month', 'quarter', 'year'];
+
 const SalesChart: React.FC<SalesChartProps> = ({ data, loading }) => {
+  const [view, setView] = useState<'category' | 'time'>('category');
+  const [granularity, setGranularity] = useState<SeriesGranularity>('month');
+  const [series, setSeries] = useState<SalesSeriesPoint[]>([]);
+  const [seriesLoading, setSeriesLoading] = useState(false);
+
+  // Time buckets come from the daily rollups; refetch when the bucket size or the underlying data changes
+  useEffect(() => {
+    if (view !== 'time' || loading) return;
+    let cancelled = false;
+    setSeriesLoading(true);
+    fetchSalesSeries(granularity).then((points) => {
+      if (!cancelled) {
+        setSeries(points);
+        setSeriesLoading(false);
+      }
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [view, granularity, loading, data]);
+
   const chartData = data
     ? Object.entries(data).map(([category, values]) => ({
         category,
@@ -61,15 +87,41 @@ const SalesChart: React.FC<SalesChartProps> = ({ data, loading }) => {
       }))
     : [];
 
+  const buttonClass = (active: boolean) =>
+    `px-3 py-1 rounded text-sm ${active ? 'bg-green-600 text-white' : 'bg-gray-700 text-gray-300 hover:bg-gray-600'}`;
+
   return (
     <div className="bg-gray-800 rounded-lg shadow p-6">
-      <h2 className="text-lg font-medium text-gray-200 mb-4">Sales by Category</h2>
+      <div className="flex items-center justify-between mb-4">
+        <h2 className="text-lg font-medium text-gray-200">
+          {view === 'category' ? 'Sales by Category' : 'Sales over Time'}
+        </h2>
+        <div className="flex items-center gap-2">
+          {view === 'time' && (
+            <select
+              value={granularity}
+              onChange={(e) => setGranularity(e.target.value as SeriesGranularity)}
+              className="bg-gray-700 text-gray-200 text-sm rounded px-2 py-1"
+            >
+              {GRANULARITIES.map((g) => (
+                <option key={g} value={g}>{g}</option>
+              ))}
+            </select>
+          )}
+          <button className={buttonClass(view === 'category')} onClick={() => setView('category')}>
+            Category
+          </button>
+          <button className={buttonClass(view === 'time')} onClick={() => setView('time')}>
+            Time
+          </button>
+        </div>
+      </div>
       <div className="h-80">
-        {loading ? (
+        {loading || (view === 'time' && seriesLoading) ? (
           <div className="h-full flex items-center justify-center">
             <p className="text-gray-400">Loading data...</p>
           </div>
-        ) : (
+        ) : view === 'category' ? (
           <ResponsiveContainer width="100%" height="100%">
             <BarChart data={chartData} barCategoryGap="35%">
               <CartesianGrid strokeDasharray="3 3" stroke="#2d3748" />
@@ -85,6 +137,21 @@ const SalesChart: React.FC<SalesChartProps> = ({ data, loading }) => {
               <Bar dataKey="profit" fill="#10B981" name="Profit" />
             </BarChart>
           </ResponsiveContainer>
+        ) : (
+          <ResponsiveContainer width="100%" height="100%">
+            <LineChart data={series}>
+              <CartesianGrid strokeDasharray="3 3" stroke="#2d3748" />
+              <XAxis dataKey="period" stroke="#cbd5e0" />
+              <YAxis stroke="#cbd5e0" />
+              <Tooltip
+                contentStyle={{ backgroundColor: '#2d3748', border: 'none' }}
+                itemStyle={{ color: '#e2e8f0' }}
+              />
+              <Legend wrapperStyle={{ color: '#cbd5e0' }} />
+              <Line type="monotone" dataKey="sales" stroke="#4F46E5" name="Sales" dot={false} />
+              <Line type="monotone" dataKey="profit" stroke="#10B981" name="Profit" dot={false} />
+            </LineChart>
+          </ResponsiveContainer>
         )}
       </div>
     </div>
@@ -359,71 +359,106 @@
 
 
 
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { LayoutGrid, DoorOpen, ArrowRight } from 'lucide-react';
 import { motion } from 'framer-motion';
+import {
+  fetchLayoutPage,
+  fetchLayoutSummary,
+  LayoutItem,
+  LayoutPriority,
+  LayoutSectionSummary
+} from '../lib/api';
 
 interface StoreLayoutProps {
-  data?: Record<string, {
-    section: number;
-    priority: string;
-    category: string;
-    sub_category: string;
-    products: Array<{
-      name: string;
-      id: string;
-    }>;
-  }>;
+  // Changes whenever new data was uploaded, so the layout is fetched again
+  refreshKey?: number;
   loading?: boolean;
 }
 
-const StoreLayout: React.FC<StoreLayoutProps> = ({ data, loading }) => {
-  const [selectedAisle, setSelectedAisle] = useState<number | null>(null);
-
-  const sections = Array.from({ length: 16 }, (_, index) => {
-    const productsInSection = data
-      ? Object.entries(data).filter(([_, value]) => value.section === index)
-      : [];
+// Products fetched per page when an aisle is opened
+const PAGE_SIZE = 100;
+// Sections shown even before any layout is stored
+const MIN_SECTIONS = 16;
 
-    const totalProducts = productsInSection.reduce((acc, [_, value]) =>
-      acc + (value.products?.length || 0), 0);
+const StoreLayout: React.FC<StoreLayoutProps> = ({ refreshKey, loading }) => {
+  const [summary, setSummary] = useState<LayoutSectionSummary[]>([]);
+  const [summaryLoading, setSummaryLoading] = useState(true);
+  const [selectedAisle, setSelectedAisle] = useState<number | null>(null);
+  const [priorityFilter, setPriorityFilter] = useState<LayoutPriority | ''>('');
+  const [aisleProducts, setAisleProducts] = useState<LayoutItem[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [aisleLoading, setAisleLoading] = useState(false);
+
+  useEffect(() => {
+    let cancelled = false;
+    setSummaryLoading(true);
+    fetchLayoutSummary().then((sections) => {
+      if (!cancelled) {
+        setSummary(sections);
+        setSummaryLoading(false);
+      }
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [refreshKey]);
+
+  // Only the open aisle's products are fetched, a page at a time
+  useEffect(() => {
+    if (selectedAisle === null) return;
+    let cancelled = false;
+    setAisleProducts([]);
+    setNextCursor(null);
+    setAisleLoading(true);
+    fetchLayoutPage({
+      section: selectedAisle,
+      priority: priorityFilter || undefined,
+      limit: PAGE_SIZE
+    }).then((page) => {
+      if (!cancelled) {
+        setAisleProducts(page.items);
+        setNextCursor(page.next_cursor);
+        setAisleLoading(false);
+      }
+    });
+    return () => {
+      cancelled = true;
+    };
+  }, [selectedAisle, priorityFilter, refreshKey]);
+
+  const loadMore = async () => {
+    if (selectedAisle === null || !nextCursor) return;
+    setAisleLoading(true);
+    const page = await fetchLayoutPage({
+      section: selectedAisle,
+      priority: priorityFilter || undefined,
+      after: nextCursor,
+      limit: PAGE_SIZE
+    });
+    setAisleProducts((products) => [...products, ...page.items]);
+    setNextCursor(page.next_cursor);
+    setAisleLoading(false);
+  };
 
-    const aisleName = getAisleName(productsInSection);
+  // The backend decides how many sections the layout uses
+  const sectionCount = Math.max(MIN_SECTIONS, ...summary.map((entry) => entry.section + 1));
+  const summaryBySection = new Map(summary.map((entry) => [entry.section, entry]));
 
+  const sections = Array.from({ length: sectionCount }, (_, index) => {
+    const entry = summaryBySection.get(index);
     return {
       id: index,
-      aisleName,
-      products: productsInSection,
-      totalProducts,
-      priority: determineSectionPriority(productsInSection)
+      aisleName: entry?.top_sub_category || 'Uncategorized Aisle',
+      totalProducts: entry?.products || 0,
+      priority: determineSectionPriority(entry)
     };
   });
 
-  function getAisleName(productsInSection: any[]) {
-    const categoryNames = productsInSection.flatMap(([_, value]) => value.sub_category);
-    return findMostCommonName(categoryNames) || "Uncategorized Aisle";
-  }
-
-  function findMostCommonName(arr: string[]) {
-    if (arr.length === 0) return '';
-    const frequencyMap: Record<string, number> = {};
-    let maxCount = 0, mostCommonName = '';
-
-    arr.forEach(name => {
-      frequencyMap[name] = (frequencyMap[name] || 0) + 1;
-      if (frequencyMap[name] > maxCount) {
-        maxCount = frequencyMap[name];
-        mostCommonName = name;
-      }
-    });
-
-    return mostCommonName;
-  }
-
-  function determineSectionPriority(products: any[]) {
-    const priorities = products.map(([_, value]) => value.priority);
-    if (priorities.includes('high')) return 'high';
-    if (priorities.includes('medium')) return 'medium';
+  function determineSectionPriority(entry?: LayoutSectionSummary) {
+    if (!entry) return 'low';
+    if (entry.high > 0) return 'high';
+    if (entry.medium > 0) return 'medium';
     return 'low';
   }
 
@@ -433,6 +468,18 @@ const StoreLayout: React.FC<StoreLayoutProps> = ({ data, loading }) => {
     low: 'bg-blue-600 hover:bg-blue-700 text-white',
   }[priority] || 'bg-gray-700 hover:bg-gray-800 text-gray-200');
 
+  const closeAisle = () => {
+    setSelectedAisle(null);
+    setPriorityFilter('');
+  };
+
+  const ProductCard = ({ product }: { product: LayoutItem }) => (
+    <div className={`p-2 rounded shadow-sm mb-2 ${getPriorityColor(product.priority)}`}>
+      <p className="text-sm">{product.product_name || product.product_id}</p>
+      <p className="text-xs">Priority: {product.priority}</p>
+    </div>
+  );
+
   const AisleView = ({ section }: { section: any }) => (
     <motion.div 
       className="fixed inset-0 bg-black bg-opacity-70 flex items-center justify-center z-50"
@@ -445,33 +492,51 @@ const StoreLayout: React.FC<StoreLayoutProps> = ({ data, loading }) => {
           <h3 className="text-lg font-medium text-gray-200">
             {section.aisleName} - Aisle {section.id + 1}
           </h3>
-          <button
-            className="text-gray-400 hover:text-gray-200"
-            onClick={() => setSelectedAisle(null)}
-          >
-            ✕
-          </button>
+          <div className="flex items-center gap-4">
+            <select
+              value={priorityFilter}
+              onChange={(event) => setPriorityFilter(event.target.value as LayoutPriority | '')}
+              className="bg-gray-700 text-gray-200 text-sm rounded px-2 py-1"
+            >
+              <option value="">All priorities</option>
+              <option value="high">High</option>
+              <option value="medium">Medium</option>
+              <option value="low">Low</option>
+            </select>
+            <button
+              className="text-gray-400 hover:text-gray-200"
+              onClick={closeAisle}
+            >
+              ✕
+            </button>
+          </div>
         </div>
-        <div className="flex justify-between gap-4 h-full">
+        <div className="flex justify-between gap-4">
           <div className="w-1/2 p-4 rounded-lg shadow-inner bg-gray-700">
             <h4 className="text-md font-medium text-gray-200 mb-2">Left Rack</h4>
-            {section.products.slice(0, Math.ceil(section.products.length / 2)).map(([productId, details]: [string, any]) => (
-              <div key={productId} className={`p-2 rounded shadow-sm mb-2 ${getPriorityColor(details.priority)}`}>
-                <p className="text-sm">{details.products?.[0]?.name || productId}</p>
-                <p className="text-xs">Priority: {details.priority}</p>
-              </div>
+            {aisleProducts.slice(0, Math.ceil(aisleProducts.length / 2)).map((product) => (
+              <ProductCard key={product.product_id} product={product} />
             ))}
           </div>
           <div className="w-1/2 p-4 rounded-lg shadow-inner bg-gray-700">
             <h4 className="text-md font-medium text-gray-200 mb-2">Right Rack</h4>
-            {section.products.slice(Math.ceil(section.products.length / 2)).map(([productId, details]: [string, any]) => (
-              <div key={productId} className={`p-2 rounded shadow-sm mb-2 ${getPriorityColor(details.priority)}`}>
-                <p className="text-sm">{details.products?.[0]?.name || productId}</p>
-                <p className="text-xs">Priority: {details.priority}</p>
-              </div>
+            {aisleProducts.slice(Math.ceil(aisleProducts.length / 2)).map((product) => (
+              <ProductCard key={product.product_id} product={product} />
             ))}
           </div>
         </div>
+        <div className="flex justify-center mt-4">
+          {aisleLoading ? (
+            <p className="text-gray-400 text-sm">Loading products...</p>
+          ) : nextCursor && (
+            <button
+              className="px-4 py-2 rounded bg-gray-700 hover:bg-gray-600 text-gray-200 text-sm"
+              onClick={loadMore}
+            >
+              Load more ({aisleProducts.length} of {section.totalProducts})
+            </button>
+          )}
+        </div>
       </div>
     </motion.div>
   );
@@ -483,7 +548,7 @@ const StoreLayout: React.FC<StoreLayoutProps> = ({ data, loading }) => {
         <h2 className="text-lg font-medium text-gray-200">Store Layout Optimization</h2>
       </div>
 
-      {loading ? (
+      {loading || summaryLoading ? (
         <div className="h-80 flex items-center justify-center">
           <p className="text-gray-400">Loading layout data...</p>
         </div>
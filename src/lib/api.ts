@@ -4,13 +4,39 @@ const API_BASE_URL = 'http://localhost:5500/api';
 
 async function checkServerConnection(): Promise<boolean> {
   try {
-    const response = await fetch(`${API_BASE_URL}/analytics`);
+    const response = await fetch(`${API_BASE_URL}/health`);
     return response.ok;
   } catch {
     return false;
   }
 }
 
+// Stages written to file_history by the backend, in pipeline order
+const JOB_STAGES = ['Pending', 'Reading_Success', 'Cleaning_Success', 'Processing_Success', 'Completed'];
+const JOB_POLL_INTERVAL_MS = 1000;
+
+async function waitForJob(jobId: string, onProgress: (progress: number) => void) {
+  while (true) {
+    const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+    const job = await response.json();
+    if (!response.ok) {
+      throw new Error(job.error || 'Failed to fetch job status');
+    }
+
+    if (job.status === 'completed') {
+      onProgress(100);
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Failed to process data');
+    }
+
+    const stageIndex = JOB_STAGES.indexOf(job.stage);
+    onProgress(Math.round((Math.max(stageIndex, 0) / (JOB_STAGES.length - 1)) * 100));
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+}
+
 export async function processDataFile(formData: FormData, p0: (progress: number) => void) {
   try {
     const isServerRunning = await checkServerConnection();
@@ -28,8 +54,8 @@ export async function processDataFile(formData: FormData, p0: (progress: number)
       throw new Error(error.error || 'Failed to process data');
     }
 
-    const data = await response.json();
-    return data;
+    const { job_id } = await response.json();
+    return await waitForJob(job_id, p0);
   } catch (error) {
     const message = error instanceof Error ? error.message : 'Failed to connect to server';
     toast.error(message);
@@ -74,4 +100,98 @@ export async function fetchAnalytics() {
       layout_recommendations: {}
     };
   }
-}
\ No newline at end of file
+}
+export type SeriesGranularity = 'day' | 'week' | 'month' | 'quarter' | 'year';
+
+export interface SalesSeriesPoint {
+  period: string;
+  sales: number;
+  profit: number;
+  quantity: number;
+  orders: number;
+}
+
+export async function fetchSalesSeries(
+  granularity: SeriesGranularity = 'month',
+  from?: string,
+  to?: string
+): Promise<SalesSeriesPoint[]> {
+  try {
+    const params = new URLSearchParams({ granularity });
+    if (from) params.set('from', from);
+    if (to) params.set('to', to);
+
+    const response = await fetch(`${API_BASE_URL}/analytics?${params}`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch sales series');
+    }
+    const data = await response.json();
+    return data.series;
+  } catch (error) {
+    console.error('Sales series error:', error);
+    return [];
+  }
+}
+
+export type LayoutPriority = 'high' | 'medium' | 'low';
+
+export interface LayoutSectionSummary {
+  section: number;
+  products: number;
+  high: number;
+  medium: number;
+  low: number;
+  top_sub_category: string | null;
+}
+
+export interface LayoutItem {
+  product_id: string;
+  product_name: string;
+  section: number;
+  priority: LayoutPriority;
+  sub_category: string;
+}
+
+export interface LayoutPage {
+  items: LayoutItem[];
+  next_cursor: string | null;
+}
+
+export async function fetchLayoutSummary(): Promise<LayoutSectionSummary[]> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/layout/summary`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch layout summary');
+    }
+    const data = await response.json();
+    return data.sections;
+  } catch (error) {
+    console.error('Layout summary error:', error);
+    return [];
+  }
+}
+
+export async function fetchLayoutPage(filters: {
+  section?: number;
+  priority?: LayoutPriority;
+  subCategory?: string;
+  after?: string | null;
+  limit?: number;
+}): Promise<LayoutPage> {
+  try {
+    const params = new URLSearchParams({ limit: String(filters.limit ?? 100) });
+    if (filters.section !== undefined) params.set('section', String(filters.section));
+    if (filters.priority) params.set('priority', filters.priority);
+    if (filters.subCategory) params.set('sub_category', filters.subCategory);
+    if (filters.after) params.set('after', filters.after);
+
+    const response = await fetch(`${API_BASE_URL}/layout?${params}`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch layout');
+    }
+    return await response.json();
+  } catch (error) {
+    console.error('Layout error:', error);
+    return { items: [], next_cursor: null };
+  }
+}